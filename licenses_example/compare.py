@@ -1,10 +1,9 @@
 # built-in
-from itertools import islice
 from pathlib import Path
 from sys import argv
 
 # project
-from textdistance import EntropyNCD
+from textdistance import EntropyNCD, NCDIndex
 
 
 # read files
@@ -20,14 +19,8 @@ if len(argv) == 1:
 # compare all with one
 qval = int(argv[1]) if argv[1] else None
 compare_with = argv[2]
-distances = dict()
-for name, content in licenses.items():
-    distances[name] = EntropyNCD(qval=qval)(
-        licenses[compare_with],
-        content,
-    )
+index = NCDIndex(EntropyNCD(qval=qval), licenses)
 
 # show 5 most similar
-sorted_distances = sorted(distances.items(), key=lambda d: d[1])
-for name, distance in islice(sorted_distances, 5):
+for name, distance in index.nearest(licenses[compare_with], k=5):
     print('{:20} {:.4f}'.format(name, distance))
@@ -14,7 +14,7 @@ ALG = textdistance.arith_ncd
 
 @pytest.mark.parametrize('left, right, expected', [
     ('test', 'test', 1),
-    ('test', 'nani', 2.1666666666666665),
+    ('test', 'nani', 2.3333333333333335),
 ])
 def test_similarity(left, right, expected):
     actual = ALG(left, right)
@@ -33,3 +33,20 @@ def test_arith_output():
     alg = textdistance.ArithNCD(terminator='\x00')
     fraction = alg._compress('BANANA')
     assert fraction.numerator == 1525
+
+
+def test_arith_size():
+    alg = textdistance.ArithNCD(terminator='\x00')
+    # 3 * log2(7 / 3) + 2 * log2(7 / 2) + 2 * log2(7) = 12.9
+    assert alg._get_size('BANANA') == 13
+
+
+def test_long():
+    actual = ALG('test' * 1000, 'nani' * 1000)
+    assert isclose(actual, 2.3333333333333335)
+
+
+def test_order_invariant():
+    alg = textdistance.ArithNCD(terminator='\x00')
+    assert alg._get_concat_size(['test', 'nani']) == alg._get_concat_size(['nani', 'test'])
+    assert alg('test', 'nani', 'text') == textdistance.ArithNCD(terminator='\x00', greedy=True)('test', 'nani', 'text')
@@ -18,3 +18,22 @@ ALG = textdistance.bwtrle_ncd
 def test_similarity(left, right, expected):
     actual = ALG(left, right)
     assert isclose(actual, expected)
+
+
+@pytest.mark.parametrize('data', [
+    'banana',
+    'abracadabra',
+    'mississippi' * 10,
+    'ab' * 100,
+])
+def test_bwt(data):
+    alg = textdistance.BWTRLENCD(terminator='$')
+    data += '$'
+    rotations = sorted(data[i:] + data[:i] for i in range(len(data)))
+    expected = ''.join(rotation[-1] for rotation in rotations)
+    assert alg._compress(data[:-1]) == textdistance.RLENCD()._compress(expected)
+
+
+def test_long():
+    actual = ALG('test' * 10000, 'nani' * 10000)
+    assert isclose(actual, 1.25)
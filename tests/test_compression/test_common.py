@@ -1,4 +1,5 @@
 # built-in
+import mmap
 from math import isclose
 
 # external
@@ -65,3 +66,108 @@ def test_normalized_by_one(left, right, alg):
     s = alg.normalized_similarity(left, right)
     d = alg.normalized_distance(left, right)
     assert isclose(s + d, 1)
+
+
+@pytest.mark.parametrize('alg', ALGS)
+def test_many(alg):
+    candidates = ['test', 'text', 'nani', '', 'text']
+    assert alg.many('test', candidates) == [alg('test', c) for c in candidates]
+
+
+@pytest.mark.parametrize('alg', ALGS)
+def test_greedy(alg):
+    if alg.order_invariant:
+        return
+    greedy = type(alg)(greedy=True)
+    assert greedy('test', 'nani') == alg('test', 'nani')
+    seqs = ('test', 'nani', 'text', 'testnani')
+    assert greedy(*seqs) >= alg(*seqs)
+
+
+@pytest.mark.parametrize('alg', [textdistance.bz2_ncd, textdistance.zlib_ncd])
+def test_many_query_first(alg):
+    candidates = ['test', 'text', 'nani', '', 'test' * 50]
+    actual = alg.many('test', candidates, query_first=True)
+    expected = [alg._normalize(
+        alg._get_size(('test' + c).encode()),
+        [alg._get_size(b'test'), alg._get_size(c.encode())],
+    ) for c in candidates]
+    assert actual == expected
+
+
+def test_size_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / 'sizes.sqlite')
+    with textdistance.SizeCache(maxsize=2, path=path) as cache:
+        alg = textdistance.ZLIBNCD(cache=cache)
+        assert alg('test', 'nani') == textdistance.zlib_ncd('test', 'nani')
+        assert alg('test', 'text') == textdistance.zlib_ncd('test', 'text')
+        assert len(cache) == 2
+
+    expected = textdistance.zlib_ncd._get_size(b'nani')
+    monkeypatch.setattr(textdistance.ZLIBNCD, '_get_size', lambda self, data: 0)
+    with textdistance.SizeCache(path=path) as cache:
+        assert textdistance.ZLIBNCD(cache=cache)._get_single_size(b'nani') == expected
+        # settings that don't change compressed sizes aren't the part of the key
+        assert textdistance.ZLIBNCD(greedy=True, cache=cache)._get_single_size(b'nani') == expected
+        # but other settings are
+        size = len(cache)
+        for alg in (textdistance.ArithNCD(), textdistance.ArithNCD(greedy=True), textdistance.ArithNCD(base=3)):
+            alg.cache = cache
+            alg._get_single_size('nani')
+        assert len(cache) == size + 2
+
+
+def test_size_cache_streams(tmp_path, monkeypatch):
+    data = b'test' * 100 + b'nani' * 10
+    path = tmp_path / 'data'
+    path.write_bytes(data)
+    cache = textdistance.SizeCache()
+    alg = textdistance.ZLIBNCD(cache=cache)
+    alg.chunk_size = 100
+    expected = alg._get_single_size(data)
+    assert len(cache) == 1
+
+    # all forms of the same content share the cached size
+    monkeypatch.setattr(textdistance.ZLIBNCD, '_get_concat_size', lambda self, sequences: 0)
+    assert alg._get_single_size(path) == expected
+    assert alg._get_single_size(memoryview(data)) == expected
+    with path.open('rb') as stream:
+        assert alg._get_single_size(stream) == expected
+    assert len(cache) == 1
+
+
+@pytest.mark.parametrize('alg', [textdistance.BZ2NCD(), textdistance.LZMANCD(), textdistance.ZLIBNCD()])
+def test_streams(alg, tmp_path):
+    left = b'test' * 1000 + b'nani' * 100
+    right = b'text' * 500
+    expected = alg(left, right)
+
+    alg.chunk_size = 100
+    assert alg(left, right) == expected
+    assert alg(bytearray(left), memoryview(right)) == expected
+
+    path = tmp_path / 'left'
+    path.write_bytes(left)
+    assert alg(path, right) == expected
+    assert alg.many(path, [right, right]) == [expected, expected]
+    with path.open('rb') as stream:
+        assert alg(stream, right) == expected
+        assert alg.many(right, [stream], query_first=True) == alg.many(right, [left], query_first=True)
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            assert alg(mapped, right) == expected
+
+
+@pytest.mark.parametrize('alg', ALGS)
+def test_index(alg):
+    corpus = {'test': 'test', 'text': 'text', 'nani': 'nani'}
+    index = textdistance.NCDIndex(alg, corpus)
+    assert index.distances('tent') == [alg('tent', doc) for doc in corpus.values()]
+    nearest = index.nearest('tent', k=2)
+    assert [distance for _, distance in nearest] == sorted(alg('tent', doc) for doc in corpus.values())[:2]
+    assert index.matrix(processes=1) == [[alg(left, right) for right in corpus.values()] for left in corpus.values()]
+
+
+def test_index_matrix_pool():
+    corpus = ['test', 'text', 'nani', 'tent']
+    index = textdistance.NCDIndex(textdistance.zlib_ncd, corpus)
+    assert index.matrix(processes=2) == index.matrix(processes=1)
@@ -52,3 +52,27 @@ def test_distance_ident_with_gap_05(left, right, expected):
 def test_distance_ident_with_gap_5(left, right, expected):
     actual = ALG(gap_open=5, gap_ext=5, sim_func=sim_ident)(left, right)
     assert actual == expected
+
+
+@pytest.mark.parametrize('left, right, expected', [
+    ('AGACTAGTTAC', 'CGAG', -4.5),
+    ('CG', 'AGACTAGTTACAG', -6.5),
+    ('', 'GAT', -3),
+])
+def test_distance_ident_with_gap_2(left, right, expected):
+    actual = ALG(gap_open=2, gap_ext=.5, sim_func=sim_ident)(left, right)
+    assert actual == expected
+
+
+@pytest.mark.parametrize('left, right, expected', [
+    ('AGACTAGTTAC', 'CGAGACGT', [
+        ('insert', 0, 0, 0, 2), ('equal', 0, 4, 2, 6), ('delete', 4, 6, 6, 6),
+        ('equal', 6, 8, 6, 8), ('delete', 8, 11, 8, 8),
+    ]),
+    ('CG', 'AGACTAGTTACAG', [
+        ('insert', 0, 0, 0, 3), ('equal', 0, 1, 3, 4), ('insert', 1, 1, 4, 12), ('equal', 1, 2, 12, 13),
+    ]),
+])
+def test_align(left, right, expected):
+    actual = ALG(gap_open=1, gap_ext=.5, sim_func=sim_ident).align(left, right)
+    assert actual == expected
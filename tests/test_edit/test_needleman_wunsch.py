@@ -30,6 +30,17 @@ def test_distance_matrix(left, right, expected):
     assert actual == expected
 
 
+@pytest.mark.parametrize('left, right, expected', [
+    ('AGACTAGTTAC', 'CGAGACGT', 16),
+    # not in alphabet
+    ('AGACTAGTTAC', 'CGAGACGTX', 21),
+])
+def test_distance_compiled_matrix(left, right, expected):
+    sim_matrix = textdistance.Matrix(NW_MATRIX, symmetric=True).compile('ACGT')
+    actual = ALG(gap_cost=5, sim_func=sim_matrix)(left, right)
+    assert actual == expected
+
+
 def sim_ident(x, y):
     if x == y:
         return 1
@@ -53,3 +64,25 @@ def test_distance_ident(left, right, expected):
 def test_distance_ident_with_gap_5(left, right, expected):
     actual = ALG(gap_cost=5, sim_func=sim_ident)(left, right)
     assert actual == expected
+
+
+@pytest.mark.parametrize('left, right, expected', [
+    ('AGACTAGTTAC', 'CGAG', -12),
+    ('CG', 'AGACTAGTTACAG', -20),
+])
+def test_distance_ident_with_gap_2(left, right, expected):
+    actual = ALG(gap_cost=2, sim_func=sim_ident)(left, right)
+    assert actual == expected
+
+
+@pytest.mark.parametrize('left, right, expected', [
+    ('test', 'tet', [('equal', 0, 2, 0, 2), ('delete', 2, 3, 2, 2), ('equal', 3, 4, 2, 3)]),
+    ('', 'ab', [('insert', 0, 0, 0, 2)]),
+    ('GATTACA', 'GCATGCU', [
+        ('equal', 0, 1, 0, 1), ('insert', 1, 1, 1, 2), ('equal', 1, 2, 2, 3), ('delete', 2, 3, 3, 3),
+        ('equal', 3, 4, 3, 4), ('replace', 4, 5, 4, 5), ('equal', 5, 6, 5, 6), ('replace', 6, 7, 6, 7),
+    ]),
+])
+def test_align(left, right, expected):
+    actual = ALG(sim_func=sim_ident).align(left, right)
+    assert actual == expected
@@ -0,0 +1,29 @@
+# external
+import pytest
+
+# project
+import textdistance
+
+
+WORDS = ['test', 'text', 'tent', 'testing', 'nani', 'tset', 'a', '', 'attest']
+
+
+@pytest.mark.parametrize('alg', [
+    textdistance.Levenshtein(external=False),
+    textdistance.DamerauLevenshtein(external=False),
+])
+@pytest.mark.parametrize('qval', [1, 2, 3])
+@pytest.mark.parametrize('query', ['test', 'tets', 'a', '', 'testin'])
+@pytest.mark.parametrize('max_distance', [0, 1, 2])
+def test_search(alg, qval, query, max_distance):
+    index = textdistance.QGramIndex(WORDS, qval=qval, algorithm=alg)
+    expected = [
+        (key, alg(query, word)) for key, word in enumerate(WORDS)
+        if alg(query, word) <= max_distance
+    ]
+    assert index.search(query, max_distance) == expected
+
+
+def test_keys():
+    index = textdistance.QGramIndex({word.upper(): word for word in WORDS})
+    assert index.search('test') == [('TEST', 0), ('TEXT', 1), ('TENT', 1)]
@@ -30,6 +30,17 @@ def test_distance_matrix(left, right, expected):
     assert actual == expected
 
 
+@pytest.mark.parametrize('left, right, expected', [
+    ('AGACTAGTTAC', 'CGAGACGT', 26),
+    # not in alphabet
+    ('AGACTAGTTAC', 'CGAGACGTX', 31),
+])
+def test_distance_compiled_matrix(left, right, expected):
+    sim_matrix = textdistance.Matrix(NW_MATRIX, symmetric=True).compile('ACGT')
+    actual = ALG(gap_cost=5, sim_func=sim_matrix)(left, right)
+    assert actual == expected
+
+
 def sim_ident(x, y):
     if x == y:
         return 1
@@ -53,3 +64,13 @@ def test_distance_ident(left, right, expected):
 def test_distance_ident_with_gap_5(left, right, expected):
     actual = ALG(gap_cost=5, sim_func=sim_ident)(left, right)
     assert actual == expected
+
+
+@pytest.mark.parametrize('left, right, expected', [
+    ('xxABCDyy', 'zzABXDww', [('equal', 2, 4, 2, 4)]),
+    ('xxABCDyy', 'zzABCDww', [('equal', 2, 6, 2, 6)]),
+    ('abc', 'xyz', []),
+])
+def test_align(left, right, expected):
+    actual = ALG(sim_func=sim_ident).align(left, right)
+    assert actual == expected
@@ -0,0 +1,80 @@
+# project
+import textdistance
+
+
+PEOPLE_A = {
+    1: {'name': 'Smith', 'city': 'London'},
+    2: {'name': 'Catherine', 'city': 'Paris'},
+    3: {'name': 'Johanson', 'city': 'Berlin'},
+}
+PEOPLE_B = [
+    ('a', {'name': 'Smyth', 'city': 'London'}),
+    ('b', {'name': 'Kathryn', 'city': 'Paris'}),
+    ('c', {'name': 'Johansson', 'city': 'Bern'}),
+    ('d', {'name': 'Smith', 'city': 'Paris'}),
+]
+
+
+def get_pairs(blocker):
+    return sorted((item_a[0], item_b[0]) for item_a, item_b in blocker.pairs(PEOPLE_A, PEOPLE_B))
+
+
+def test_exact():
+    assert get_pairs(textdistance.ExactBlocker('city')) == [(1, 'a'), (2, 'b'), (2, 'd')]
+    assert get_pairs(textdistance.ExactBlocker(lambda r: r['name'][0])) == [(1, 'a'), (1, 'd'), (3, 'c')]
+
+
+def test_length():
+    assert get_pairs(textdistance.LengthBlocker('name')) == [(1, 'a'), (1, 'd'), (2, 'c')]
+    assert get_pairs(textdistance.LengthBlocker('name', tolerance=1)) == [
+        (1, 'a'), (1, 'd'), (2, 'c'), (3, 'b'), (3, 'c'),
+    ]
+
+
+def test_phonetic():
+    assert get_pairs(textdistance.PhoneticBlocker('name')) == [(1, 'd'), (3, 'c')]
+
+
+def test_qgram():
+    assert get_pairs(textdistance.QGramBlocker('name', qval=2, min_common=3)) == [(1, 'd'), (3, 'c')]
+
+
+def test_sorted_neighbourhood():
+    assert get_pairs(textdistance.SortedNeighbourhoodBlocker('name', window=2)) == [
+        (1, 'b'), (1, 'd'), (3, 'c'),
+    ]
+
+
+def test_combine():
+    city = textdistance.ExactBlocker('city')
+    name = textdistance.PhoneticBlocker('name')
+    assert get_pairs(city | name) == [(1, 'a'), (1, 'd'), (2, 'b'), (2, 'd'), (3, 'c')]
+    assert get_pairs(city & textdistance.LengthBlocker('name')) == [(1, 'a')]
+    neighbourhood = textdistance.SortedNeighbourhoodBlocker('name', window=2)
+    assert get_pairs(neighbourhood | name) == [(1, 'b'), (1, 'd'), (3, 'c')]
+    assert get_pairs((city | name) & neighbourhood) == [(1, 'd'), (3, 'c')]
+
+
+def test_combine_streams_first_records():
+    consumed = []
+
+    def records():
+        for item in PEOPLE_A.items():
+            consumed.append(item[0])
+            yield item
+
+    blocker = textdistance.ExactBlocker('city') | textdistance.PhoneticBlocker('name')
+    pairs = blocker.pairs(records(), PEOPLE_B)
+    item_a, item_b = next(pairs)
+    assert (item_a[0], item_b[0]) == (1, 'a')
+    assert consumed == [1]
+
+
+def test_linker():
+    linker = textdistance.Linker(
+        textdistance.ExactBlocker('city'),
+        {'name': textdistance.levenshtein, 'city': textdistance.jaccard},
+    )
+    result = list(linker.link(PEOPLE_A, PEOPLE_B))
+    assert result[0] == (1, 'a', {'name': 0.8, 'city': 1})
+    assert [ids for *ids, _ in result] == [[1, 'a'], [2, 'b'], [2, 'd']]
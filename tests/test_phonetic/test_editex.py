@@ -59,3 +59,41 @@ def test_local(left, right, expected):
 
     actual = ALG(external=True, local=True)(left, right)
     assert actual == expected
+
+
+@pytest.mark.parametrize('left, right, max_distance, expected', [
+    ('nelson', 'neilsen', 2, 2),
+    ('nelson', 'neilsen', 1, 2),
+    ('aluminum', 'Catalan', 5, 6),
+    ('nelson', '', 5, 6),
+    ('niall', 'neal', 0, 1),
+])
+def test_max_distance(left, right, max_distance, expected):
+    actual = ALG(external=False, max_distance=max_distance)(left, right)
+    assert actual == expected
+
+
+@pytest.mark.parametrize('left, right', [
+    ('nelson', 'neilsen'),
+    ('aluminum', 'Catalan'),
+    # deletions of repeated letters are free, so the band can't be fixed
+    ('aaaaaaaaaab', 'ab'),
+    ('xxxnelson', 'neilsen'),
+    ('nelsonxxxxxxx', 'nelson'),
+])
+@pytest.mark.parametrize('local', [False, True])
+def test_max_distance_band(left, right, local):
+    expected = ALG(local=local)(left, right)
+    for max_distance in range(expected + 2):
+        actual = ALG(local=local, max_distance=max_distance)(left, right)
+        assert actual == min(expected, max_distance + 1)
+
+
+def test_custom_groups():
+    alg = ALG(external=False, groups=[frozenset('AB')], ungrouped=frozenset())
+    assert alg('a', 'b') == 1
+    assert alg('a', 'c') == 2
+
+
+def test_upper_case_longer():
+    assert ALG().normalized_distance('0', 'ﬁ') == 1
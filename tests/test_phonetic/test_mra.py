@@ -0,0 +1,29 @@
+# external
+import pytest
+
+# project
+import textdistance
+
+
+ALG = textdistance.MRA
+NAMES = [
+    'Byrne', 'Boern', 'Smith', 'Smyth', 'Catherine', 'Kathryn',
+    'Aleksander', 'Alexander', 'Jo', 'Johanson', '',
+]
+
+
+@pytest.mark.parametrize('word', ['Smith', 'Kathryn', 'Alexandra', 'J', ''])
+def test_index_search(word):
+    index = textdistance.MRAIndex(NAMES)
+    expected = [(key, ALG()(word, name)) for key, name in enumerate(NAMES) if ALG()(word, name)]
+    assert sorted(index.search(word)) == expected
+
+
+def test_index_first_letter():
+    index = textdistance.MRAIndex({name: name for name in NAMES}, first_letter=True)
+    assert sorted(index.candidates('Kathryn')) == ['Kathryn']
+    assert index.search('Kathryn') == [('Kathryn', 6)]
+    # it's lossy: matches with another first letter are dropped
+    assert textdistance.mra('Catherine', 'Kathryn') > 0
+    assert textdistance.MRAIndex(['Kathryn'], first_letter=True).search('Catherine') == []
+    assert textdistance.MRAIndex(['Kathryn']).search('Catherine') == [(0, 3)]
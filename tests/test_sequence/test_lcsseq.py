@@ -39,3 +39,48 @@ def test_distance_multiseq(seqs, expected):
 
     actual = ALG(external=True)(*seqs)
     assert actual == expected
+
+
+@pytest.mark.parametrize('left, right, expected', [
+    ('ab', 'cd', 0),
+    ('test', 'text', 3),
+    ('thisisatest', 'testing123testing', 7),
+    ('a' * 80, 'a' * 80, 80),
+    ('ab' * 1000, 'ba' * 1000, 1999),
+    (b'DIXON', b'DICKSONX', 4),
+    ([[1], [2]], [[2]], 1),
+])
+def test_similarity(left, right, expected):
+    actual = ALG(external=False).similarity(left, right)
+    assert actual == expected
+
+
+@pytest.mark.parametrize('seqs, expected', [
+    (('test', 'text', 'tempest'), 3),
+    (('thisisatest', 'testing123testing', 'tsitest', 'test'), 4),
+    (('ab' * 30, 'ba' * 30, 'a' * 30 + 'b' * 30), 30),
+    (('a' * 40, 'a' * 40, 'a' * 40, 'a' * 40, 'a' * 40), 40),
+])
+def test_similarity_multiseq(seqs, expected):
+    assert ALG().similarity(*seqs) == expected
+    assert len(ALG()(*seqs)) == expected
+    assert len(ALG(max_states=10)(*seqs)) == expected
+    test_func = lambda *elements: len(set(elements)) == 1  # noQA
+    assert ALG(test_func=test_func).similarity(*seqs) == expected
+
+
+def _is_subsequence(subsequence, sequence):
+    iterator = iter(sequence)
+    return all(element in iterator for element in subsequence)
+
+
+@pytest.mark.parametrize('test_func', [None, lambda *elements: len(set(elements)) == 1])
+def test_max_states(test_func):
+    seqs = ('abcabdacbdcabdca' * 3, 'bacdbacdbcadbcab' * 3, 'cabdcbadcbadbcad' * 3)
+    expected = ALG(test_func=test_func).similarity(*seqs)
+    # the bound is much less than the memo gets
+    alg = ALG(test_func=test_func, max_states=20)
+    assert alg.similarity(*seqs) == expected
+    actual = alg(*seqs)
+    assert len(actual) == expected
+    assert all(_is_subsequence(actual, s) for s in seqs)
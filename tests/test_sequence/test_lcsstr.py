@@ -36,3 +36,19 @@ def test_distance(left, right, expected):
 
     actual = ALG(external=True)(left, right)
     assert actual == expected
+
+
+@pytest.mark.parametrize('seqs, expected', [
+    (('a', 'b', 'c'), ''),
+    (('abcd', 'xbcx', 'bcbc'), 'bc'),
+    (('thisisatest', 'testing123testing', 'tsitest'), 'test'),
+    (('ab' * 150, 'xab' * 100), 'ab'),
+    (('MYTEST' * 100, 'TESTMY' * 100, 'STMYTE' * 50), 'STMYTE' * 50),
+    ((['ab', 'cd', 'ef'], ['cd', 'ef', 'ab'], ['x', 'cd', 'ef']), ['cd', 'ef']),
+])
+def test_distance_multiseq(seqs, expected):
+    actual = ALG(external=False)(*seqs)
+    assert actual == expected
+
+    actual = ALG(external=True)(*seqs)
+    assert actual == expected
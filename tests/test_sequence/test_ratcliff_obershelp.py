@@ -0,0 +1,32 @@
+# built-in
+from math import isclose
+
+# external
+import pytest
+
+# project
+import textdistance
+
+
+ALG = textdistance.RatcliffObershelp
+
+
+@pytest.mark.parametrize('seqs, expected', [
+    (('test', 'text'), .75),
+    (('GESTALT PATTERN MATCHING', 'GESTALT PRACTICE'), .6),
+    (('test', 'text', 'tempest'), .6),
+    # long texts don't hit the recursion limit
+    (('ab' * 2000, 'ba' * 2000), .99975),
+    # long texts are matched like LCSStr does it
+    (('abcd' * 55 + 'xyz', 'xyzabdcabcdbcad' * 15), 11 / 224),
+])
+def test_similarity(seqs, expected):
+    actual = ALG()(*seqs)
+    assert isclose(actual, expected)
+
+
+def test_many():
+    candidates = ['test', '', 'text', 'GESTALT PRACTICE', 'xyzabdcabcdbcad' * 15]
+    alg = ALG()
+    actual = alg.many('text', candidates)
+    assert actual == [alg(candidate, 'text') for candidate in candidates]
@@ -18,3 +18,52 @@ ALG = textdistance.MongeElkan
 def test_similarity(left, right, expected):
     actual = ALG(qval=1, algorithm=textdistance.jaro_winkler).similarity(left, right)
     assert isclose(actual, expected)
+
+
+class CountingAlgorithm:
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self.calls = 0
+
+    def maximum(self, *sequences):
+        return self.algorithm.maximum(*sequences)
+
+    def similarity(self, *sequences):
+        self.calls += 1
+        return self.algorithm.similarity(*sequences)
+
+
+def test_symmetric_pairs_once():
+    algorithm = CountingAlgorithm(textdistance.jaro_winkler)
+    alg = ALG(algorithm=algorithm, symmetric=True, qval=None, symmetric_inner=True)
+    actual = alg('main st main', 'main street')
+    expected = ALG(algorithm=textdistance.jaro_winkler, qval=None)
+    assert isclose(actual, (expected('main st main', 'main street') + expected('main street', 'main st main')) / 2)
+    assert algorithm.calls == 4
+
+
+def test_asymmetric_inner():
+    inner = textdistance.Tversky(ks=[1, 0])
+    assert ALG(algorithm=inner, qval=None, symmetric=True)('ab cdef', 'abcd') == 0.4375
+
+
+def test_cache():
+    cache = dict()
+    algorithm = CountingAlgorithm(textdistance.jaro_winkler)
+    alg = ALG(algorithm=algorithm, qval=None, cache=cache)
+    expected = alg('main st', 'main street')
+    assert algorithm.calls == 4
+    assert alg('main st', 'main street') == expected
+    assert algorithm.calls == 4
+    assert (algorithm, 'main', 'street') in cache
+    # the same cache for another algorithm
+    other = ALG(algorithm=textdistance.levenshtein, qval=None, cache=cache)
+    expected = ALG(algorithm=textdistance.levenshtein, qval=None)('main st', 'main street')
+    assert other('main st', 'main street') == expected
+
+
+def test_inner_maximum():
+    algorithm = CountingAlgorithm(textdistance.jaro_winkler)
+    alg = ALG(algorithm=algorithm, qval=None, inner_maximum=1)
+    assert alg('main', 'main st rd') == 1
+    assert algorithm.calls == 1
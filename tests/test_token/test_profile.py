@@ -0,0 +1,90 @@
+# built-in
+from collections import Counter
+from math import isclose
+
+# external
+import hypothesis
+import pytest
+
+# project
+import textdistance
+from textdistance.algorithms import base
+
+
+ALGS = [
+    textdistance.Jaccard(external=False),
+    textdistance.Jaccard(as_set=True, external=False),
+    textdistance.Sorensen(external=False),
+    textdistance.Overlap(external=False),
+    textdistance.Cosine(external=False),
+    textdistance.Cosine(as_set=True, external=False),
+    textdistance.Tversky(ks=[.5, 2], external=False),
+    textdistance.Bag(),
+]
+
+
+@pytest.fixture(params=['numpy', 'pure'])
+def vocabulary(request, monkeypatch):
+    if request.param == 'pure':
+        monkeypatch.setattr(base, 'numpy', None)
+    return textdistance.Vocabulary()
+
+
+@pytest.mark.parametrize('alg', ALGS)
+@pytest.mark.parametrize('left, right', [
+    ('test', 'text'),
+    ('nelson', 'neilsen'),
+    ('decide', 'resize'),
+    ('aaab', 'abbb'),
+    ('test', 'test'),
+    ('', 'test'),
+])
+def test_profiles(vocabulary, alg, left, right):
+    profiles = vocabulary.profile(left), vocabulary.profile(right)
+    for method in ('__call__', 'similarity', 'distance', 'normalized_similarity', 'normalized_distance'):
+        expected = getattr(alg, method)(left, right)
+        actual = getattr(alg, method)(*profiles)
+        assert isclose(actual, expected), method
+
+
+def test_operations(vocabulary):
+    left, right = 'abracadabra', 'cabaret'
+    p1, p2 = vocabulary.profile(left), vocabulary.profile(right)
+    c1, c2 = Counter(left), Counter(right)
+    assert vocabulary.decode(p1 & p2) == c1 & c2
+    assert vocabulary.decode(p1 | p2) == c1 | c2
+    assert vocabulary.decode(p1 + p2) == c1 + c2
+    assert vocabulary.decode(p1 - p2) == c1 - c2
+    assert vocabulary.decode(p2 - p1) == c2 - c1
+    assert p1 == vocabulary.profile(left)
+    assert len({p1, vocabulary.profile(left), p2}) == 2
+
+
+def test_words_and_ngrams():
+    for qval in (None, 2):
+        vocabulary = textdistance.Vocabulary(qval=qval)
+        alg = textdistance.Jaccard(qval=qval, external=False)
+        left, right = 'the quick brown fox', 'the brown quick dog'
+        expected = alg(left, right)
+        assert isclose(alg(vocabulary.profile(left), vocabulary.profile(right)), expected)
+
+
+def test_hashed_ngrams():
+    pytest.importorskip('numpy')
+    left, right = 'nelson', 'neilsen'
+    alg = textdistance.Jaccard(external=False)
+    p1 = textdistance.TokenProfile.from_ids(textdistance.hash_ngrams(left, 2))
+    p2 = textdistance.TokenProfile.from_ids(textdistance.hash_ngrams(right, 2))
+    assert isclose(alg(p1, p2), textdistance.Jaccard(qval=2, external=False)(left, right))
+
+
+@hypothesis.given(
+    left=hypothesis.strategies.text(),
+    right=hypothesis.strategies.text(),
+)
+def test_compare_with_strings(left, right):
+    vocabulary = textdistance.Vocabulary()
+    for alg in ALGS:
+        expected = alg(left, right)
+        actual = alg(vocabulary.profile(left), vocabulary.profile(right))
+        assert isclose(actual, expected)
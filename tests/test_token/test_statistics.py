@@ -0,0 +1,61 @@
+# built-in
+from math import isclose
+
+# external
+import hypothesis
+import pytest
+
+# project
+import textdistance
+
+
+ALGS = [
+    textdistance.Jaccard(external=False),
+    textdistance.Jaccard(as_set=True, external=False),
+    textdistance.Sorensen(external=False),
+    textdistance.Sorensen(as_set=True, external=False),
+    textdistance.Overlap(external=False),
+    textdistance.Cosine(external=False),
+    textdistance.Cosine(as_set=True, external=False),
+    textdistance.Tversky(ks=[.5, 2], external=False),
+    textdistance.Tanimoto(external=False),
+    textdistance.Bag(),
+]
+
+
+@pytest.mark.parametrize('left, right', [
+    ('test', 'text'),
+    ('nelson', 'neilsen'),
+    ('test', 'test'),
+    ('', 'test'),
+])
+def test_statistics(left, right):
+    statistics = textdistance.TokenStatistics(left, right)
+    assert statistics(*ALGS) == [alg(left, right) for alg in ALGS]
+
+
+def test_counts():
+    statistics = textdistance.TokenStatistics('aaab', 'abbc')
+    assert statistics.sizes() == [4, 4]
+    assert statistics.sizes(as_set=True) == [2, 3]
+    assert statistics.intersection() == 2
+    assert statistics.intersection(as_set=True) == 2
+    assert statistics.union() == 6
+    assert statistics.union(as_set=True) == 3
+
+
+def test_qval():
+    statistics = textdistance.TokenStatistics('the cat', 'cat the', qval=None)
+    assert statistics(textdistance.Jaccard(qval=None)) == [1]
+    with pytest.raises(ValueError):
+        statistics(textdistance.Jaccard())
+
+
+@hypothesis.given(
+    left=hypothesis.strategies.text(),
+    right=hypothesis.strategies.text(),
+)
+def test_compare_with_algorithms(left, right):
+    statistics = textdistance.TokenStatistics(left, right)
+    for alg, actual in zip(ALGS, statistics(*ALGS)):
+        assert isclose(actual, alg(left, right))
@@ -0,0 +1,47 @@
+# built-in
+from math import isclose
+
+# external
+import pytest
+
+# project
+import textdistance
+
+
+numpy = pytest.importorskip('numpy')
+
+CORPUS = ['test', 'text', 'nelson', 'neilsen', 'decide', 'resize', 'aaab', 'abbb']
+ALGS = {
+    'cosine': textdistance.Cosine,
+    'jaccard': textdistance.Jaccard,
+    'overlap': textdistance.Overlap,
+}
+
+
+@pytest.mark.parametrize('metric', sorted(ALGS))
+@pytest.mark.parametrize('qval', [1, 2])
+@pytest.mark.parametrize('as_set', [False, True])
+def test_similarities(metric, qval, as_set):
+    matrix = textdistance.TokenMatrix(CORPUS, qval=qval, as_set=as_set)
+    alg = ALGS[metric](qval=qval, as_set=as_set, external=False)
+    for query in CORPUS + ['tent', 'xyz']:
+        expected = [alg(query, document) for document in CORPUS]
+        actual = matrix.similarities(query, metric=metric)
+        assert all(map(isclose, actual, expected))
+
+
+def test_nearest():
+    matrix = textdistance.TokenMatrix({'a': 'test', 'b': 'text', 'c': 'xyz'})
+    assert matrix.nearest('tesla', k=1, metric='jaccard') == [('a', 3 / 6)]
+    assert [key for key, _ in matrix.nearest('text', k=5)] == ['b', 'a', 'c']
+    assert matrix.nearest('qq', k=5) == []
+    with pytest.raises(ValueError):
+        matrix.nearest('text', metric='levenshtein')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 100])
+def test_top_k(chunk_size):
+    matrix = textdistance.TokenMatrix(CORPUS, qval=2)
+    for key, nearest in matrix.top_k(k=2, metric='jaccard', chunk_size=chunk_size):
+        expected = [item for item in matrix.nearest(CORPUS[key], k=3, metric='jaccard') if item[0] != key]
+        assert nearest == expected[:2]
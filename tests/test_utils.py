@@ -0,0 +1,79 @@
+# built-in
+from itertools import permutations
+
+# external
+import hypothesis
+import pytest
+
+# project
+import textdistance
+from textdistance.utils import _solve_assignment, hash_ngrams, iter_ngrams, words_combinations
+
+
+@pytest.mark.parametrize('data, n, expected', [
+    ('test', 2, ['te', 'es', 'st']),
+    (b'test', 3, [b'tes', b'est']),
+    ('te', 3, []),
+    ([1, 2, 3], 2, [(1, 2), (2, 3)]),
+])
+def test_find_ngrams(data, n, expected):
+    assert textdistance.find_ngrams(data, n) == [tuple(ngram) for ngram in expected]
+    assert list(iter_ngrams(data, n)) == expected
+    assert list(iter_ngrams(iter(data), n)) == [tuple(ngram) for ngram in expected]
+
+
+def test_hash_ngrams():
+    pytest.importorskip('numpy')
+    hashes = hash_ngrams('abcab', 2).tolist()
+    assert len(hashes) == 4
+    assert hashes[0] == hashes[3] != hashes[1]
+    assert hash_ngrams(b'abcab', 2).tolist() == hashes
+    assert len(hash_ngrams('a', 2)) == 0
+
+
+@pytest.mark.parametrize('alg', [
+    textdistance.Jaccard, textdistance.Sorensen, textdistance.Overlap,
+    textdistance.Cosine, textdistance.Tversky, textdistance.Bag,
+])
+def test_token_based_hashes(alg):
+    pytest.importorskip('numpy')
+    expected = alg(qval=2)('testing', 'texting')
+    assert alg()(hash_ngrams('testing', 2), hash_ngrams('texting', 2)) == expected
+
+
+@pytest.mark.parametrize('mode', ['permutations', 'assignment', 'sorted'])
+def test_words_combinations(mode):
+    actual = words_combinations(textdistance.levenshtein, '12 main street', 'main street 12', mode=mode)
+    assert actual == 0
+    actual = words_combinations(textdistance.levenshtein, '12 main st', 'main street 12', mode=mode)
+    assert actual == 4
+
+
+def test_words_combinations_set():
+    assert words_combinations(textdistance.levenshtein, 'main street', 'main street 12', mode='set') == 0
+    # no common words, so it's the distance between the sorted texts
+    assert words_combinations(textdistance.levenshtein, 'a', 'xyz qwe', mode='set') == 7
+    with pytest.raises(ValueError):
+        words_combinations(textdistance.levenshtein, 'a', 'b', mode='unknown')
+
+
+@hypothesis.given(
+    costs=hypothesis.strategies.integers(1, 4).flatmap(lambda rows: hypothesis.strategies.lists(
+        hypothesis.strategies.lists(hypothesis.strategies.integers(0, 20), min_size=5, max_size=5),
+        min_size=rows, max_size=rows,
+    )),
+)
+def test_solve_assignment(costs):
+    columns = _solve_assignment(costs)
+    assert len(set(columns)) == len(costs)
+    expected = min(
+        sum(row[column] for row, column in zip(costs, permutation))
+        for permutation in permutations(range(5), len(costs))
+    )
+    assert sum(row[column] for row, column in zip(costs, columns)) == expected
+
+
+def test_hash_ngrams_monge_elkan():
+    pytest.importorskip('numpy')
+    with pytest.raises(TypeError):
+        textdistance.MongeElkan()(hash_ngrams('test', 3), hash_ngrams('text', 3))
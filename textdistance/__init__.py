@@ -17,4 +17,5 @@ VERSION = __version__
 
 # app
 from .algorithms import *  # noQA
+from .linkage import *  # noQA
 from .utils import *  # noQA
@@ -1,9 +1,16 @@
 # built-in
+from array import array
 from collections import Counter
 
 # app
 from ..libraries import prototype
-from ..utils import find_ngrams
+from ..utils import find_ngrams, iter_ngrams
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 libraries = prototype.clone()
@@ -90,7 +97,7 @@ class Base:
             return 0
         if self._ident(*sequences):
             return 0
-        if not all(sequences):
+        if any(map(self._is_empty, sequences)):
             return self.maximum(*sequences)
         # try get answer from external libs
         answer = self.external_answer(*sequences)
@@ -107,10 +114,22 @@ class Base:
         except TypeError:
             # for unhashable elements
             for e1, e2 in zip(elements, elements[1:]):
+                # numpy arrays are compared elementwise
+                if hasattr(e1, 'tolist'):
+                    e1 = e1.tolist()
+                if hasattr(e2, 'tolist'):
+                    e2 = e2.tolist()
                 if e1 != e2:
                     return False
             return True
 
+    @staticmethod
+    def _is_empty(sequence):
+        try:
+            return len(sequence) == 0
+        except TypeError:
+            return not sequence
+
     def _get_sequences(self, *sequences):
         """Prepare sequences.
 
@@ -129,11 +148,28 @@ class Base:
 
     def _get_counters(self, *sequences):
         """Prepare sequences and convert it to Counters.
+
+        NumPy arrays (like ones from `hash_ngrams`) are counted as token ids.
         """
-        # already Counters
-        if all(isinstance(s, Counter) for s in sequences):
+        # already Counters or token profiles
+        if all(isinstance(s, (Counter, TokenProfile)) for s in sequences):
             return sequences
-        return [Counter(s) for s in self._get_sequences(*sequences)]
+        return [self._make_counter(s) for s in sequences]
+
+    def _make_counter(self, sequence):
+        if isinstance(sequence, (Counter, TokenProfile)):
+            return sequence
+        # numpy array
+        if hasattr(sequence, 'tolist') and hasattr(sequence, 'dtype'):
+            return Counter(sequence.tolist())
+        # by words
+        if not self.qval:
+            return Counter(sequence.split())
+        # by chars
+        if self.qval == 1:
+            return Counter(sequence)
+        # by n-grams, without building the list of them
+        return Counter(iter_ngrams(sequence, self.qval))
 
     def _intersect_counters(self, *sequences):
         intersection = sequences[0].copy()
@@ -157,7 +193,7 @@ class Base:
         """Return all elements count from Counter
         """
         if getattr(self, 'as_set', False):
-            return len(set(counter))
+            return len(counter)
         else:
             return sum(counter.values())
 
@@ -182,9 +218,174 @@ class BaseSimilarity(Base):
             return self.maximum(*sequences)
         if self._ident(*sequences):
             return self.maximum(*sequences)
-        if not all(sequences):
+        if any(map(self._is_empty, sequences)):
             return 0
         # try get answer from external libs
         answer = self.external_answer(*sequences)
         if answer is not None:
             return answer
+
+
+class TokenProfile:
+    """Counter of integer token ids stored as sorted arrays of ids and counts.
+
+    Profiles support the same operations as Counters that token based
+    algorithms use (`&`, `|`, `+`, `-`, `len` and `values`), so they can be
+    passed into the algorithms instead of sequences. Operations merge sorted
+    arrays (with NumPy if it's installed) instead of hashing every token.
+    Profiles to compare must be made by the same `Vocabulary`.
+    """
+    __slots__ = ('ids', 'counts')
+
+    def __init__(self, ids=(), counts=()):
+        if numpy:
+            ids = numpy.asarray(ids)
+            if ids.dtype.kind not in 'iu':
+                ids = ids.astype(numpy.int64)
+            self.ids = ids
+            self.counts = numpy.asarray(counts, dtype=numpy.int64)
+        else:
+            self.ids = array('q', ids)
+            self.counts = array('q', counts)
+
+    @classmethod
+    def from_ids(cls, ids):
+        """Make profile from the iterable of token ids (like `hash_ngrams` result).
+        """
+        if numpy:
+            ids = numpy.asarray(ids if hasattr(ids, '__len__') else list(ids))
+            return cls(*numpy.unique(ids, return_counts=True))
+        counter = Counter(ids)
+        ids = sorted(counter)
+        return cls(ids, [counter[i] for i in ids])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __eq__(self, other):
+        if not isinstance(other, TokenProfile):
+            return NotImplemented
+        if numpy:
+            return numpy.array_equal(self.ids, other.ids) and numpy.array_equal(self.counts, other.counts)
+        return self.ids == other.ids and self.counts == other.counts
+
+    def __hash__(self):
+        return hash((tuple(self.ids.tolist()), tuple(self.counts.tolist())))
+
+    def __repr__(self):
+        return '{name}({data})'.format(
+            name=type(self).__name__,
+            data=dict(zip(self.ids.tolist(), self.counts.tolist())),
+        )
+
+    def values(self):
+        return self.counts.tolist()
+
+    def copy(self):
+        # profiles are never changed in place
+        return self
+
+    def _align(self, other):
+        """Return union of ids and counts of both profiles for these ids.
+        """
+        ids = numpy.union1d(self.ids, other.ids)
+        counts1 = numpy.zeros(len(ids), dtype=numpy.int64)
+        counts1[numpy.searchsorted(ids, self.ids)] = self.counts
+        counts2 = numpy.zeros(len(ids), dtype=numpy.int64)
+        counts2[numpy.searchsorted(ids, other.ids)] = other.counts
+        return ids, counts1, counts2
+
+    def _merge(self, other, func):
+        """Merge sorted ids of both profiles, keep only positive results of func.
+        """
+        ids1, counts1 = self.ids, self.counts
+        ids2, counts2 = other.ids, other.counts
+        ids, counts = [], []
+        i = j = 0
+        while i < len(ids1) or j < len(ids2):
+            if j == len(ids2) or (i < len(ids1) and ids1[i] < ids2[j]):
+                token, count = ids1[i], func(counts1[i], 0)
+                i += 1
+            elif i == len(ids1) or ids2[j] < ids1[i]:
+                token, count = ids2[j], func(0, counts2[j])
+                j += 1
+            else:
+                token, count = ids1[i], func(counts1[i], counts2[j])
+                i += 1
+                j += 1
+            if count > 0:
+                ids.append(token)
+                counts.append(count)
+        return type(self)(ids, counts)
+
+    def __and__(self, other):
+        if not numpy:
+            return self._merge(other, min)
+        ids, indices1, indices2 = numpy.intersect1d(
+            self.ids, other.ids, assume_unique=True, return_indices=True,
+        )
+        return type(self)(ids, numpy.minimum(self.counts[indices1], other.counts[indices2]))
+
+    def __or__(self, other):
+        if not numpy:
+            return self._merge(other, max)
+        ids, counts1, counts2 = self._align(other)
+        return type(self)(ids, numpy.maximum(counts1, counts2))
+
+    def __add__(self, other):
+        if not numpy:
+            return self._merge(other, lambda c1, c2: c1 + c2)
+        ids, counts1, counts2 = self._align(other)
+        return type(self)(ids, counts1 + counts2)
+
+    def __sub__(self, other):
+        if not numpy:
+            return self._merge(other, lambda c1, c2: c1 - c2)
+        ids, counts1, counts2 = self._align(other)
+        counts = counts1 - counts2
+        return type(self)(ids[counts > 0], counts[counts > 0])
+
+
+class Vocabulary:
+    """Interns tokens into integer ids and makes `TokenProfile`s of sequences.
+
+    Sequences are split into tokens the same way as token based algorithms
+    do it for the same `qval`. New tokens get the next free id.
+    """
+    def __init__(self, qval=1):
+        self.qval = qval
+        self.ids = dict()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, token):
+        return token in self.ids
+
+    def tokenize(self, sequence):
+        # by words
+        if not self.qval:
+            return sequence.split()
+        # by chars
+        if self.qval == 1:
+            return sequence
+        # by n-grams
+        return iter_ngrams(sequence, self.qval)
+
+    def encode(self, sequence):
+        """Return list of ids of the sequence tokens, adding new tokens into the vocabulary.
+        """
+        ids = self.ids
+        return [ids.setdefault(token, len(ids)) for token in self.tokenize(sequence)]
+
+    def profile(self, sequence):
+        return TokenProfile.from_ids(self.encode(sequence))
+
+    def decode(self, profile):
+        """Return Counter of tokens for the profile.
+        """
+        tokens = {token_id: token for token, token_id in self.ids.items()}
+        return Counter({tokens[i]: c for i, c in zip(profile.ids.tolist(), profile.counts.tolist())})
@@ -1,14 +1,29 @@
 # built-in
 import codecs
 import math
-from collections import Counter
+import mmap
+import os
+import re
+import sqlite3
+import zlib
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 from fractions import Fraction
+from functools import partial
+from hashlib import blake2b
+from heapq import nsmallest
 from itertools import groupby, permutations
 
 # app
 from .base import Base as _Base
 
 
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
 try:
     import lzma
 except ImportError:
@@ -21,6 +36,8 @@ __all__ = [
 
     'bz2_ncd', 'lzma_ncd', 'arith_ncd', 'rle_ncd', 'bwtrle_ncd', 'zlib_ncd',
     'sqrt_ncd', 'entropy_ncd',
+
+    'SizeCache', 'NCDIndex',
 ]
 
 
@@ -30,16 +47,122 @@ except NameError:
     string_types = (str, )
 
 
+class SizeCache:
+    """Bounded cache for compressed sizes of single sequences.
+
+    Keys are blake2b hashes of the sequence and the compressor settings,
+    so one cache can be shared between compressors. The least recently used
+    sizes are dropped when there are more than `maxsize` of them.
+
+    If `path` is passed, sizes are also stored in the sqlite database
+    and are available after restart. Call `flush` (or use the cache
+    as a context manager) to commit the last stored sizes.
+    """
+    def __init__(self, maxsize=2 ** 16, path=None, commit_every=1000):
+        self.maxsize = maxsize
+        self.path = path
+        self.commit_every = commit_every
+        self._sizes = OrderedDict()
+        self._uncommitted = 0
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path)
+            self._db.execute('CREATE TABLE IF NOT EXISTS sizes (key BLOB PRIMARY KEY, size)')
+
+    @staticmethod
+    def make_key(data, settings):
+        if isinstance(data, str):
+            data = data.encode('utf-8', 'surrogatepass')
+        elif not isinstance(data, bytes):
+            data = repr(data).encode('utf-8', 'surrogatepass')
+        return SizeCache.make_stream_key([data], settings)
+
+    @staticmethod
+    def make_stream_key(chunks, settings):
+        """Make the key for bytes read in chunks, without joining them.
+
+        The key is the same as `make_key` gives for the joined bytes.
+        """
+        key = blake2b(digest_size=16)
+        for chunk in chunks:
+            key.update(chunk)
+        key.update(settings.encode('utf-8'))
+        return key.digest()
+
+    def get(self, key):
+        size = self._sizes.get(key)
+        if size is not None:
+            self._sizes.move_to_end(key)
+            return size
+        if self._db is None:
+            return None
+        row = self._db.execute('SELECT size FROM sizes WHERE key = ?', (key, )).fetchone()
+        if row is None:
+            return None
+        self._remember(key, row[0])
+        return row[0]
+
+    def set(self, key, size):
+        self._remember(key, size)
+        if self._db is None:
+            return
+        self._db.execute('INSERT OR REPLACE INTO sizes VALUES (?, ?)', (key, size))
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.flush()
+
+    def _remember(self, key, size):
+        self._sizes[key] = size
+        if len(self._sizes) > self.maxsize:
+            self._sizes.popitem(last=False)
+
+    def flush(self):
+        if self._db is not None:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 class _NCDBase(_Base):
     """Normalized compression distance (NCD)
 
+    Compressed size of the concatenation is the minimal one over all
+    permutations of sequences. Pass `greedy=True` to find the order greedily
+    when there are many sequences. It never gives a smaller NCD.
+
+    Pass `cache=SizeCache()` to reuse compressed sizes of single sequences
+    between calls. SqrtNCD and EntropyNCD don't accept it, because they
+    calculate sizes from counters, and that is cheaper than a cache lookup.
+
     https://articles.orsinium.dev/other/ncd/
     https://en.wikipedia.org/wiki/Normalized_compression_distance#Normalized_compression_distance
     """
     qval = 1
-
-    def __init__(self, qval=1):
+    # size of the compressed concatenation doesn't depend on order of inputs
+    order_invariant = False
+    greedy = False
+    cache = None
+    # attributes that don't change compressed sizes and aren't the part of cache keys
+    _runtime_settings = ('cache', 'greedy', 'chunk_size')
+
+    def __init__(self, qval=1, greedy=False, cache=None):
         self.qval = qval
+        self.greedy = greedy
+        self.cache = cache
 
     def maximum(self, *sequences):
         return 1
@@ -47,56 +170,305 @@ class _NCDBase(_Base):
     def _get_size(self, data):
         return len(self._compress(data))
 
+    def _get_settings(self):
+        """Get settings of the compressor for keys of the size cache.
+        """
+        return repr((type(self).__name__, sorted(
+            (name, value) for name, value in vars(self).items() if name not in self._runtime_settings
+        )))
+
+    def _make_key(self, data):
+        return self.cache.make_key(data, self._get_settings())
+
+    def _get_single_size(self, data):
+        """Get compressed size of one sequence, using the cache if any.
+        """
+        if self.cache is None:
+            return self._get_size(data)
+        key = self._make_key(data)
+        size = self.cache.get(key)
+        if size is None:
+            size = self._get_size(data)
+            self.cache.set(key, size)
+        return size
+
+    @staticmethod
+    def _concat(sequences):
+        empty = type(sequences[0])()
+        if isinstance(empty, (str, bytes)):
+            return empty.join(sequences)
+        return sum(sequences, empty)
+
+    def _get_concat_size(self, sequences):
+        return self._get_size(self._concat(sequences))
+
+    def _get_greedy_size(self, sequences):
+        """Get compressed size of the concatenation in a greedy order.
+
+        Starting from every sequence, the sequence that gives the smallest
+        compressed size of the concatenation is appended on every step.
+        It takes O(n^3) compressions instead of n! for all permutations.
+        The result is the size of one of the permutations, so it's never
+        less than the minimal one and NCD is never underestimated.
+        For 2 sequences it is the same as the minimal size.
+        """
+        best = float('Inf')
+        for start in range(len(sequences)):
+            order = [sequences[start]]
+            rest = sequences[:start] + sequences[start + 1:]
+            size = self._get_single_size(order[0])
+            while rest:
+                size, index = min(
+                    (self._get_concat_size(order + [seq]), index)
+                    for index, seq in enumerate(rest)
+                )
+                order.append(rest.pop(index))
+            best = min(best, size)
+        return best
+
     def __call__(self, *sequences):
         if not sequences:
             return 0
         sequences = self._get_sequences(*sequences)
 
-        concat_len = float('Inf')
-        empty = type(sequences[0])()
-        for data in permutations(sequences):
-            if isinstance(empty, (str, bytes)):
-                data = empty.join(data)
-            else:
-                data = sum(data, empty)
-            concat_len = min(concat_len, self._get_size(data))
+        if self.order_invariant:
+            concat_len = self._get_concat_size(sequences)
+        elif self.greedy:
+            concat_len = self._get_greedy_size(list(sequences))
+        else:
+            concat_len = min(self._get_concat_size(data) for data in permutations(sequences))
+
+        compressed_lens = [self._get_single_size(s) for s in sequences]
+        return self._normalize(concat_len, compressed_lens)
 
-        compressed_lens = [self._get_size(s) for s in sequences]
+    @staticmethod
+    def _normalize(concat_len, compressed_lens):
         max_len = max(compressed_lens)
         if max_len == 0:
             return 0
-        return (concat_len - min(compressed_lens) * (len(sequences) - 1)) / max_len
+        return (concat_len - min(compressed_lens) * (len(compressed_lens) - 1)) / max_len
+
+    def _prepare(self, data):
+        """Convert the data into the form that compressor sizes take.
+        """
+        return self._get_sequences(data)[0]
+
+    def _get_prepared_size(self, data):
+        return self._get_single_size(data)
+
+    def _get_pair_size_func(self, query, query_first=False):
+        """Return function that gets compressed size of the query and the data.
+
+        Both orders are compressed and the smallest size is returned,
+        unless `query_first` is True or the compressor is order invariant.
+        """
+        if query_first or self.order_invariant:
+            return lambda data: self._get_concat_size([query, data])
+        return lambda data: min(
+            self._get_concat_size([query, data]),
+            self._get_concat_size([data, query]),
+        )
+
+    def many(self, query, candidates, query_first=False):
+        """Get NCD between the query and every candidate.
+
+        The query is prepared and compressed only once.
+        Pass `query_first=True` to compress only the query followed
+        by a candidate, instead of both orders. Then NCD can be greater.
+        """
+        query = self._prepare(query)
+        query_size = self._get_prepared_size(query)
+        get_pair_size = self._get_pair_size_func(query, query_first)
+        result = []
+        for candidate in candidates:
+            candidate = self._prepare(candidate)
+            sizes = [query_size, self._get_prepared_size(candidate)]
+            result.append(self._normalize(get_pair_size(candidate), sizes))
+        return result
+
+
+class _CounterNCDBase(_NCDBase):
+    """NCD for compressors that depend only on counts of elements.
+
+    These compressors are order invariant.
+    Size of a concatenation is calculated from the sum of counters,
+    without building the concatenation itself. Sizes are summed with
+    `math.fsum`, so they don't depend on order of elements.
+    """
+    order_invariant = True
+
+    def _get_size(self, data):
+        return self._get_counter_size(Counter(data))
+
+    def _get_counter_size(self, counter):
+        raise NotImplementedError
+
+    def __call__(self, *sequences):
+        if not sequences:
+            return 0
+        counters = self._get_counters(*sequences)
+        concat_len = self._get_counter_size(self._sum_counters(*counters))
+        compressed_lens = [self._get_counter_size(c) for c in counters]
+        return self._normalize(concat_len, compressed_lens)
+
+    def _prepare(self, data):
+        return self._get_counters(data)[0]
+
+    def _get_prepared_size(self, data):
+        return self._get_counter_size(data)
+
+    def _get_pair_size_func(self, query, query_first=False):
+        return lambda data: self._get_counter_size(query + data)
 
 
 class _BinaryNCDBase(_NCDBase):
+    """NCD for compressors of bytes.
+
+    Besides strings and bytes, it accepts paths (`os.PathLike`), binary file
+    objects, `mmap` objects and other bytes-like objects. They are streamed
+    in chunks through the compression object, and the concatenation
+    is streamed as a chain of inputs without building it in memory.
+    File objects must be seekable, they are read from the beginning.
+    With the cache, keys of streamed inputs are digests of their content,
+    so they are read once more to look up the size.
+    """
+    chunk_size = 2 ** 20
+    header_size = 0
 
-    def __init__(self):
-        pass
+    def __init__(self, greedy=False, cache=None):
+        self.greedy = greedy
+        self.cache = cache
 
     def __call__(self, *sequences):
         if not sequences:
             return 0
-        if isinstance(sequences[0], string_types):
-            sequences = [s.encode('utf-8') for s in sequences]
+        sequences = [self._encode(s) for s in sequences]
         return super().__call__(*sequences)
 
+    @staticmethod
+    def _encode(data):
+        if isinstance(data, string_types):
+            return data.encode('utf-8')
+        return data
+
+    def _compressor(self):
+        """Return a new compression object with `compress` and `flush` methods.
+        """
+        raise NotImplementedError
+
+    def _iter_chunks(self, data):
+        if isinstance(data, os.PathLike):
+            with open(data, 'rb') as stream:
+                yield from self._iter_chunks(stream)
+            return
+        if hasattr(data, 'read') and not isinstance(data, mmap.mmap):
+            data.seek(0)
+            yield from iter(partial(data.read, self.chunk_size), b'')
+            return
+        view = memoryview(data).cast('B')
+        for start in range(0, len(view), self.chunk_size):
+            yield view[start:start + self.chunk_size]
+
+    def _is_streamed(self, data):
+        return not isinstance(data, bytes) or len(data) > self.chunk_size
+
+    def _get_size(self, data):
+        if self._is_streamed(data):
+            return self._get_concat_size([data])
+        return super()._get_size(data)
+
+    def _make_key(self, data):
+        if self._is_streamed(data):
+            return self.cache.make_stream_key(self._iter_chunks(data), self._get_settings())
+        return super()._make_key(data)
+
+    def _get_concat_size(self, sequences):
+        if not any(map(self._is_streamed, sequences)):
+            return super()._get_concat_size(sequences)
+        compressor = self._compressor()
+        size = 0
+        for data in sequences:
+            for chunk in self._iter_chunks(data):
+                size += len(compressor.compress(chunk))
+        size += len(compressor.flush())
+        return max(0, size - self.header_size)
+
+    def _get_prefixed_size(self, prefix):
+        """Return function that gets compressed size of `prefix + data`.
+        """
+        return lambda data: self._get_concat_size([prefix, data])
+
+    def _prepare(self, data):
+        return self._encode(data)
+
+    def _get_pair_size_func(self, query, query_first=False):
+        get_prefixed_size = self._get_prefixed_size(query)
+        if query_first:
+            return get_prefixed_size
+        return lambda data: min(get_prefixed_size(data), self._get_concat_size([data, query]))
+
+    def many(self, query, candidates, query_first=False):
+        """Get NCD between the query and every candidate.
+
+        The query is compressed only once. Results are calculated once
+        for every distinct candidate, remembered by digests of candidates.
+
+        By default, both the query followed by a candidate and the candidate
+        followed by the query are compressed in full, so the result is the same
+        as `self(query, candidate)` gives, and there is no speedup for distinct
+        candidates. Pass `query_first=True` to compress only the first one.
+        Then NCD can be greater, but compressors that support snapshots of their
+        state (zlib) compress the query only once and then only candidates.
+        """
+        query = self._encode(query)
+        query_size = self._get_single_size(query)
+        get_pair_size = self._get_pair_size_func(query, query_first)
+        results = {}
+        result = []
+        for candidate in candidates:
+            candidate = self._encode(candidate)
+            if not isinstance(candidate, bytes):
+                size = self._get_single_size(candidate)
+                result.append(self._normalize(get_pair_size(candidate), [query_size, size]))
+                continue
+            key = SizeCache.make_key(candidate, '')
+            if key not in results:
+                size = self._get_single_size(candidate)
+                results[key] = self._normalize(get_pair_size(candidate), [query_size, size])
+            result.append(results[key])
+        return result
+
 
 class ArithNCD(_NCDBase):
     """Arithmetic coding
 
+    The compressed size is the information-theoretic length of the data
+    for the static model of its own element counts: the sum of `log(total / count)`
+    for all elements. It's calculated in linear time, and it's what an ideal
+    arithmetic coder outputs up to a couple of digits. The size depends only
+    on counts of elements, so the order of concatenated sequences doesn't matter.
+
+    `_compress` (with `_get_range` and `_get_output`) builds the exact shortest
+    output fraction with big integers. It's a debugging helper for small data,
+    the distance doesn't use it.
+
     https://github.com/gw-c/arith
     http://www.drdobbs.com/cpp/data-compression-with-arithmetic-encodin/240169251
     https://en.wikipedia.org/wiki/Arithmetic_coding
     """
+    order_invariant = True
 
-    def __init__(self, base=2, terminator=None, qval=1):
+    def __init__(self, base=2, terminator=None, qval=1, greedy=False, cache=None):
         self.base = base
         self.terminator = terminator
         self.qval = qval
+        self.greedy = greedy
+        self.cache = cache
 
-    def _make_probs(self, *sequences):
-        """
-        https://github.com/gw-c/arith/blob/master/arith.py
+    def _get_counts(self, *sequences):
+        """Get count and cumulative count for every element.
+
+        Elements are sorted from the most frequent one.
         """
         sequences = self._get_counters(*sequences)
         counts = self._sum_counters(*sequences)
@@ -104,48 +476,97 @@ class ArithNCD(_NCDBase):
             counts[self.terminator] = 1
         total_letters = sum(counts.values())
 
-        prob_pairs = {}
+        result = {}
         cumulative_count = 0
         counts = sorted(counts.items(), key=lambda x: (x[1], x[0]), reverse=True)
         for char, current_count in counts:
-            prob_pairs[char] = (
-                Fraction(cumulative_count, total_letters),
-                Fraction(current_count, total_letters),
-            )
+            result[char] = (cumulative_count, current_count)
             cumulative_count += current_count
         assert cumulative_count == total_letters
-        return prob_pairs
+        return result, total_letters
 
-    def _get_range(self, data, probs):
+    def _make_probs(self, *sequences):
+        """
+        https://github.com/gw-c/arith/blob/master/arith.py
+        """
+        counts, total_letters = self._get_counts(*sequences)
+        return {
+            char: (Fraction(cumulative_count, total_letters), Fraction(current_count, total_letters))
+            for char, (cumulative_count, current_count) in counts.items()
+        }
+
+    def _terminate(self, data):
         if self.terminator is not None:
             if self.terminator in data:
                 data = data.replace(self.terminator, '')
             data += self.terminator
+        return data
 
-        start = Fraction(0, 1)
-        width = Fraction(1, 1)
-        for char in data:
-            prob_start, prob_width = probs[char]
-            start += prob_start * width
-            width *= prob_width
-        return start, start + width
+    def _get_range(self, data, counts, total_letters):
+        """Get the range of the data as integers.
+
+        Returns `(start, width, denominator)`, so the range is from
+        `start / denominator` to `(start + width) / denominator`.
+        Ranges of halves of the data are merged pairwise (binary splitting),
+        so big numbers are multiplied only O(log n) times.
+        """
+        data = self._terminate(data)
+        if not data:
+            return 0, 1, 1
+
+        ranges = [counts[char] + (total_letters, ) for char in data]
+        while len(ranges) > 1:
+            merged = [
+                (start1 * denominator2 + width1 * start2, width1 * width2, denominator1 * denominator2)
+                for (start1, width1, denominator1), (start2, width2, denominator2)
+                in zip(ranges[::2], ranges[1::2])
+            ]
+            if len(ranges) % 2:
+                merged.append(ranges[-1])
+            ranges = merged
+        return ranges[0]
+
+    def _get_output(self, data):
+        """Get the shortest binary fraction in the range of the data.
+
+        Returns `(numerator, power)` for the fraction `numerator / 2 ** power`.
+        For every power, the candidate is the next binary fraction after the
+        range start, and it fits when `denominator - start * 2 ** power % denominator`
+        is less than `width * 2 ** power`. It always fits when `width * 2 ** power`
+        is greater than the denominator. Before that, it can fit only if the range
+        start has a run of ones in its binary expansion right after the power,
+        so other powers are skipped with one big division.
+        """
+        counts, total_letters = self._get_counts(data)
+        start, width, denominator = self._get_range(data, counts, total_letters)
+        if start == 0:
+            return 0, 0
+
+        last_power = (denominator // width).bit_length()
+        first_power = 0
+        if last_power > 2:
+            bits = (start << (last_power - 2)) // denominator
+            ones = (bits ^ (bits + 1)).bit_length() - 1
+            first_power = max(0, last_power - 2 - ones)
+
+        for power in range(first_power, last_power + 1):
+            if denominator - (start << power) % denominator < width << power:
+                break
+        return 1 + (start << power) // denominator, power
 
     def _compress(self, data):
-        probs = self._make_probs(data)
-        start, end = self._get_range(data=data, probs=probs)
-        output_fraction = Fraction(0, 1)
-        output_denominator = 1
-        while not (start <= output_fraction < end):
-            output_numerator = 1 + ((start.numerator * output_denominator) // start.denominator)
-            output_fraction = Fraction(output_numerator, output_denominator)
-            output_denominator *= 2
-        return output_fraction
+        numerator, power = self._get_output(data)
+        return Fraction(numerator, 2 ** power)
 
     def _get_size(self, data):
-        numerator = self._compress(data).numerator
-        if numerator == 0:
-            return 0
-        return math.ceil(math.log(numerator, self.base))
+        counts, total_letters = self._get_counts(data)
+        data = Counter(self._terminate(data))
+        size = math.fsum(
+            count * math.log(total_letters / counts[char][1], self.base)
+            for char, count in data.items()
+        )
+        # drop floating point noise before rounding up
+        return math.ceil(round(size, 9))
 
 
 class RLENCD(_NCDBase):
@@ -154,10 +575,21 @@ class RLENCD(_NCDBase):
     https://en.wikipedia.org/wiki/Run-length_encoding
     """
 
+    _run = re.compile(r'(.)\1*', re.DOTALL)
+
+    def _get_runs(self, data):
+        """Yield every element with the length of its run.
+        """
+        if isinstance(data, str):
+            for match in self._run.finditer(data):
+                yield match.group(1), match.end() - match.start()
+            return
+        for k, g in groupby(data):
+            yield k, sum(1 for _ in g)
+
     def _compress(self, data):
         new_data = []
-        for k, g in groupby(data):
-            n = len(list(g))
+        for k, n in self._get_runs(data):
             if n > 2:
                 new_data.append(str(n) + k)
             elif n == 1:
@@ -172,23 +604,55 @@ class BWTRLENCD(RLENCD):
     https://en.wikipedia.org/wiki/Burrows%E2%80%93Wheeler_transform
     https://en.wikipedia.org/wiki/Run-length_encoding
     """
-    def __init__(self, terminator='\0'):
+    def __init__(self, terminator='\0', greedy=False, cache=None):
         self.terminator = terminator
+        self.greedy = greedy
+        self.cache = cache
+
+    @staticmethod
+    def _suffix_array(data):
+        """Sort suffixes of the data by prefix doubling.
+
+        Suffixes are sorted by ranks of their first k elements and then
+        by ranks of the next k elements, doubling k until all ranks differ.
+        It takes O(n log^2 n) time and O(n) memory.
+        """
+        length = len(data)
+        alphabet = {element: rank for rank, element in enumerate(sorted(set(data)))}
+        ranks = [alphabet[element] for element in data]
+        suffixes = list(range(length))
+        size = 1
+        while True:
+            # the suffix that is too short goes first
+            keys = [
+                rank * (length + 1) + (ranks[index + size] + 1 if index + size < length else 0)
+                for index, rank in enumerate(ranks)
+            ]
+            suffixes.sort(key=keys.__getitem__)
+            rank = 0
+            ranks[suffixes[0]] = 0
+            for previous, index in zip(suffixes, suffixes[1:]):
+                if keys[index] != keys[previous]:
+                    rank += 1
+                ranks[index] = rank
+            if rank == length - 1:
+                return suffixes
+            size *= 2
 
     def _compress(self, data):
         if not data:
             data = self.terminator
         elif self.terminator not in data:
             data += self.terminator
-            modified = sorted(data[i:] + data[:i] for i in range(len(data)))
-            data = ''.join([subdata[-1] for subdata in modified])
+            # the terminator is unique, so sorting suffixes sorts rotations
+            data = ''.join([data[index - 1] for index in self._suffix_array(data)])
         return super()._compress(data)
 
 
 # -- NORMAL COMPRESSORS -- #
 
 
-class SqrtNCD(_NCDBase):
+class SqrtNCD(_CounterNCDBase):
     """Square Root based NCD
 
     Size of compressed data equals to sum of square roots of counts of every
@@ -200,11 +664,11 @@ class SqrtNCD(_NCDBase):
     def _compress(self, data):
         return {element: math.sqrt(count) for element, count in Counter(data).items()}
 
-    def _get_size(self, data):
-        return sum(self._compress(data).values())
+    def _get_counter_size(self, counter):
+        return math.fsum(math.sqrt(count) for count in counter.values())
 
 
-class EntropyNCD(_NCDBase):
+class EntropyNCD(_CounterNCDBase):
     """Entropy based NCD
 
     Get Entropy of input secueance as a size of compressed data.
@@ -218,11 +682,14 @@ class EntropyNCD(_NCDBase):
         self.base = base
 
     def _compress(self, data):
-        total_count = len(data)
-        entropy = 0.0
-        for element_count in Counter(data).values():
-            p = element_count / total_count
-            entropy -= p * math.log(p, self.base)
+        return self._get_entropy(Counter(data))
+
+    def _get_entropy(self, counter):
+        total_count = sum(counter.values())
+        entropy = -math.fsum(
+            count / total_count * math.log(count / total_count, self.base)
+            for count in counter.values()
+        )
         assert entropy >= 0
         return entropy
 
@@ -231,8 +698,8 @@ class EntropyNCD(_NCDBase):
         # absolute_entropy = math.log(unique_count, 2) / unique_count
         # return absolute_entropy - entropy / unique_count
 
-    def _get_size(self, data):
-        return self.coef + self._compress(data)
+    def _get_counter_size(self, counter):
+        return self.coef + self._get_entropy(counter)
 
 
 # -- BINARY COMPRESSORS -- #
@@ -242,26 +709,148 @@ class BZ2NCD(_BinaryNCDBase):
     """
     https://en.wikipedia.org/wiki/Bzip2
     """
+    header_size = 15
+
     def _compress(self, data):
-        return codecs.encode(data, 'bz2_codec')[15:]
+        return codecs.encode(data, 'bz2_codec')[self.header_size:]
+
+    def _compressor(self):
+        return bz2.BZ2Compressor()
 
 
 class LZMANCD(_BinaryNCDBase):
     """
     https://en.wikipedia.org/wiki/LZMA
     """
+    header_size = 14
+
     def _compress(self, data):
         if not lzma:
             raise ImportError('Please, install the PylibLZMA module')
-        return lzma.compress(data)[14:]
+        return lzma.compress(data)[self.header_size:]
+
+    def _compressor(self):
+        if not lzma:
+            raise ImportError('Please, install the PylibLZMA module')
+        return lzma.LZMACompressor()
 
 
 class ZLIBNCD(_BinaryNCDBase):
     """
     https://en.wikipedia.org/wiki/Zlib
     """
+    header_size = 2
+
     def _compress(self, data):
-        return codecs.encode(data, 'zlib_codec')[2:]
+        return codecs.encode(data, 'zlib_codec')[self.header_size:]
+
+    def _compressor(self):
+        return zlib.compressobj()
+
+    def _get_prefixed_size(self, prefix):
+        # compress the prefix once and continue from copies of the state
+        compressor = self._compressor()
+        prefix_size = sum(len(compressor.compress(chunk)) for chunk in self._iter_chunks(prefix))
+
+        def get_size(data):
+            snapshot = compressor.copy()
+            size = prefix_size + sum(len(snapshot.compress(chunk)) for chunk in self._iter_chunks(data))
+            size += len(snapshot.flush())
+            return size - self.header_size
+        return get_size
+
+
+# -- INDEX -- #
+
+
+# the index in a worker process of the pool
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _get_worker_row(row):
+    return _worker_index._get_row(row)
+
+
+class NCDIndex:
+    """Corpus of documents for NCD retrieval.
+
+    Every document is prepared and compressed once, when the index is created.
+    `corpus` is a mapping of keys to documents or just a sequence of documents,
+    then keys are positions in the sequence.
+
+    Pass `query_first=True` to compress only the query followed by a document
+    for queries. It's faster, especially for zlib, but NCD can be greater.
+    """
+    def __init__(self, compressor, corpus, query_first=False):
+        self.compressor = compressor
+        self.query_first = query_first
+        if isinstance(corpus, Mapping):
+            self.keys = list(corpus.keys())
+            corpus = corpus.values()
+        else:
+            corpus = list(corpus)
+            self.keys = list(range(len(corpus)))
+        self.documents = [compressor._prepare(document) for document in corpus]
+        self.sizes = [compressor._get_prepared_size(document) for document in self.documents]
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _get_distances(self, query, query_size, documents, sizes, query_first):
+        get_pair_size = self.compressor._get_pair_size_func(query, query_first)
+        normalize = self.compressor._normalize
+        return [
+            normalize(get_pair_size(document), [query_size, size])
+            for document, size in zip(documents, sizes)
+        ]
+
+    def distances(self, query):
+        """Get NCD between the query and every document, in order of the corpus.
+        """
+        query = self.compressor._prepare(query)
+        query_size = self.compressor._get_prepared_size(query)
+        return self._get_distances(query, query_size, self.documents, self.sizes, self.query_first)
+
+    def nearest(self, query, k=1):
+        """Get `k` nearest documents as a list of `(key, distance)` pairs.
+        """
+        distances = self.distances(query)
+        positions = nsmallest(k, range(len(distances)), key=distances.__getitem__)
+        return [(self.keys[position], distances[position]) for position in positions]
+
+    def _get_row(self, row):
+        # distances from the document to itself and all next documents
+        return self._get_distances(
+            self.documents[row], self.sizes[row],
+            self.documents[row:], self.sizes[row:],
+            query_first=False,
+        )
+
+    def matrix(self, processes=None):
+        """Get NCD between all pairs of documents.
+
+        Rows are calculated by a pool of `processes` processes (all CPUs
+        by default), every process gets the index once. The index must be
+        picklable for it. Pass `processes=1` to calculate in this process.
+        """
+        count = len(self.documents)
+        if processes == 1:
+            rows = map(self._get_row, range(count))
+        else:
+            chunksize = max(1, count // (4 * (processes or os.cpu_count() or 1)))
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self, )) as pool:
+                rows = list(pool.map(_get_worker_row, range(count), chunksize=chunksize))
+
+        result = [[0] * count for _ in range(count)]
+        for row, distances in enumerate(rows):
+            for column, distance in enumerate(distances, start=row):
+                result[row][column] = result[column][row] = distance
+        return result
 
 
 arith_ncd = ArithNCD()
@@ -1,9 +1,13 @@
 # built-in
-from collections import defaultdict
-from itertools import zip_longest
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from itertools import chain, zip_longest
 
 # app
+from ..utils import find_ngrams
 from .base import Base as _Base, BaseSimilarity as _BaseSimilarity
+from .simple import CompiledMatrix
 
 
 try:
@@ -17,6 +21,7 @@ __all__ = [
     'Levenshtein', 'DamerauLevenshtein',
     'Jaro', 'JaroWinkler', 'StrCmp95',
     'NeedlemanWunsch', 'Gotoh', 'SmithWaterman',
+    'QGramIndex',
 
     'hamming', 'mlipns',
     'levenshtein', 'damerau_levenshtein',
@@ -25,6 +30,33 @@ __all__ = [
 ]
 
 
+def _sim_rows(sim_func, s1, s2, swap=False):
+    """Yield lists of similarities of every element of `s1` with all elements of `s2`.
+
+    If `swap` is True then `sim_func` gets elements in the reversed order.
+    Rows are gathered from the table at once for CompiledMatrix.
+    """
+    if isinstance(sim_func, CompiledMatrix):
+        try:
+            codes1 = sim_func.encode(s1)
+            codes2 = sim_func.encode(s2)
+        except (KeyError, TypeError):
+            pass
+        else:
+            table = sim_func.table.T if swap else sim_func.table
+            columns = table[:, codes2]
+            for code in codes1:
+                yield columns[code].tolist()
+            return
+
+    if swap:
+        for c1 in s1:
+            yield [sim_func(c2, c1) for c2 in s2]
+    else:
+        for c1 in s1:
+            yield [sim_func(c1, c2) for c2 in s2]
+
+
 class Hamming(_Base):
     """
     Compute the Hamming distance between the two or more sequences.
@@ -380,34 +412,120 @@ class NeedlemanWunsch(_BaseSimilarity):
             return 1
         return (self.similarity(*sequences) - minimum) / (maximum * 2)
 
-    def __call__(self, s1, s2):
-        if not numpy:
-            raise ImportError('Please, install numpy for Needleman-Wunsch measure')
+    def _score(self, s1, s2):
+        """Needleman-Wunsch score in linear memory.
+
+        Only two rows of the DP matrix are kept.
+        Rows are made over the shorter sequence, so memory is O(min(m, n)).
+        """
+        swap = len(s2) > len(s1)
+        if swap:
+            s1, s2 = s2, s1
+
+        gap_cost = self.gap_cost
+        prev = [-(j * gap_cost) for j in range(len(s2) + 1)]
+        rows = _sim_rows(self.sim_func, s1, s2, swap=swap)
+        for i, sims in enumerate(rows, start=1):
+            cur = [-(i * gap_cost)]
+            for j, sim_val in enumerate(sims, start=1):
+                cur.append(max(
+                    prev[j - 1] + sim_val,      # match
+                    prev[j] - gap_cost,         # delete
+                    cur[j - 1] - gap_cost,      # insert
+                ))
+            prev = cur
+        return prev[-1]
 
+    def __call__(self, s1, s2):
         s1, s2 = self._get_sequences(s1, s2)
 
         # result = self.quick_answer(s1, s2)
         # if result is not None:
         #     return result * self.maximum(s1, s2)
 
-        dist_mat = numpy.zeros(
-            (len(s1) + 1, len(s2) + 1),
-            dtype=numpy.float,
-        )
-        # DP initialization
-        for i in range(len(s1) + 1):
-            dist_mat[i, 0] = -(i * self.gap_cost)
-        # DP initialization
-        for j in range(len(s2) + 1):
-            dist_mat[0, j] = -(j * self.gap_cost)
-        # Needleman-Wunsch DP calculation
-        for i, c1 in enumerate(s1, 1):
-            for j, c2 in enumerate(s2, 1):
-                match = dist_mat[i - 1, j - 1] + self.sim_func(c1, c2)
-                delete = dist_mat[i - 1, j] - self.gap_cost
-                insert = dist_mat[i, j - 1] - self.gap_cost
-                dist_mat[i, j] = max(match, delete, insert)
-        return dist_mat[dist_mat.shape[0] - 1, dist_mat.shape[1] - 1]
+        return self._score(s1, s2)
+
+    def _last_row(self, s1, s2):
+        """Get scores of aligning `s1` with every prefix of `s2`.
+        """
+        gap_cost = self.gap_cost
+        prev = [-(j * gap_cost) for j in range(len(s2) + 1)]
+        for i, sims in enumerate(_sim_rows(self.sim_func, s1, s2), start=1):
+            cur = [-(i * gap_cost)]
+            for j, sim_val in enumerate(sims, start=1):
+                cur.append(max(
+                    prev[j - 1] + sim_val,
+                    prev[j] - gap_cost,
+                    cur[j - 1] - gap_cost,
+                ))
+            prev = cur
+        return prev
+
+    def _hirschberg(self, s1, s2):
+        """Get moves of the optimal alignment in linear space.
+
+        Every move is a pair of steps over `s1` and `s2`:
+        (1, 1) aligns two elements, (1, 0) is a deletion, (0, 1) is an insertion.
+
+        https://en.wikipedia.org/wiki/Hirschberg%27s_algorithm
+        """
+        if not s1:
+            return [(0, 1)] * len(s2)
+        if not s2:
+            return [(1, 0)] * len(s1)
+
+        if len(s1) == 1:
+            # align the element with the best match or delete it
+            scores = next(_sim_rows(self.sim_func, s1, s2))
+            j = max(range(len(s2)), key=scores.__getitem__)
+            if scores[j] < -2 * self.gap_cost:
+                return [(1, 0)] + [(0, 1)] * len(s2)
+            return [(0, 1)] * j + [(1, 1)] + [(0, 1)] * (len(s2) - j - 1)
+
+        mid = len(s1) // 2
+        left = self._last_row(s1[:mid], s2)
+        right = self._last_row(s1[mid:][::-1], s2[::-1])
+        n = len(s2)
+        j = max(range(n + 1), key=lambda j: left[j] + right[n - j])
+        return self._hirschberg(s1[:mid], s2[:j]) + self._hirschberg(s1[mid:], s2[j:])
+
+    @staticmethod
+    def _to_opcodes(s1, s2, moves, i=0, j=0):
+        """Convert alignment moves into difflib-like opcodes.
+        """
+        opcodes = []
+        for di, dj in moves:
+            if di and dj:
+                tag = 'equal' if s1[i] == s2[j] else 'replace'
+            elif di:
+                tag = 'delete'
+            else:
+                tag = 'insert'
+            if opcodes and opcodes[-1][0] == tag:
+                opcodes[-1][2] = i + di
+                opcodes[-1][4] = j + dj
+            else:
+                opcodes.append([tag, i, i + di, j, j + dj])
+            i += di
+            j += dj
+        return [tuple(opcode) for opcode in opcodes]
+
+    def align(self, s1, s2):
+        """Get the optimal alignment of sequences.
+
+        Returns the list of opcodes `(tag, i1, i2, j1, j2)` like
+        `difflib.SequenceMatcher.get_opcodes` does, where tag is one of:
+
+            * equal:   s1[i1:i2] == s2[j1:j2]
+            * replace: s1[i1:i2] aligned element by element with s2[j1:j2]
+            * delete:  s1[i1:i2] aligned with a gap
+            * insert:  s2[j1:j2] aligned with a gap
+
+        Hirschberg's divide and conquer is used,
+        so only O(m + n) memory is needed.
+        """
+        s1, s2 = self._get_sequences(s1, s2)
+        return self._to_opcodes(s1, s2, self._hirschberg(s1, s2))
 
 
 class SmithWaterman(_BaseSimilarity):
@@ -430,31 +548,97 @@ class SmithWaterman(_BaseSimilarity):
     def maximum(self, *sequences):
         return min(map(len, sequences))
 
-    def __call__(self, s1, s2):
-        if not numpy:
-            raise ImportError('Please, install numpy for Smith-Waterman measure')
+    def _score(self, s1, s2):
+        """Smith-Waterman score in linear memory.
+
+        Only two rows of the DP matrix are kept.
+        Rows are made over the shorter sequence, so memory is O(min(m, n)).
+        """
+        swap = len(s2) > len(s1)
+        if swap:
+            s1, s2 = s2, s1
+
+        gap_cost = self.gap_cost
+        prev = [0] * (len(s2) + 1)
+        for sims in _sim_rows(self.sim_func, s1, s2, swap=swap):
+            cur = [0]
+            for j, sim_val in enumerate(sims, start=1):
+                # The score for substituting the letter a[i - 1] for b[j - 1].
+                # Generally low for mismatch, high for match.
+                match = prev[j - 1] + sim_val
+                # The scores for for introducing extra letters in one of the strings
+                # (or by symmetry, deleting them from the other).
+                delete = prev[j] - gap_cost
+                insert = cur[j - 1] - gap_cost
+                cur.append(max(0, match, delete, insert))
+            prev = cur
+        return prev[-1]
 
+    def __call__(self, s1, s2):
         s1, s2 = self._get_sequences(s1, s2)
 
         result = self.quick_answer(s1, s2)
         if result is not None:
             return result
 
-        dist_mat = numpy.zeros(
-            (len(s1) + 1, len(s2) + 1),
-            dtype=numpy.float,
-        )
-        for i, sc1 in enumerate(s1, start=1):
-            for j, sc2 in enumerate(s2, start=1):
-                # The score for substituting the letter a[i - 1] for b[j - 1].
-                # Generally low for mismatch, high for match.
-                match = dist_mat[i - 1, j - 1] + self.sim_func(sc1, sc2)
-                # The scores for for introducing extra letters in one of the strings
-                # (or by symmetry, deleting them from the other).
-                delete = dist_mat[i - 1, j] - self.gap_cost
-                insert = dist_mat[i, j - 1] - self.gap_cost
-                dist_mat[i, j] = max(0, match, delete, insert)
-        return dist_mat[dist_mat.shape[0] - 1, dist_mat.shape[1] - 1]
+        return self._score(s1, s2)
+
+    def align(self, s1, s2):
+        """Get the best local alignment of sequences.
+
+        Returns opcodes like `NeedlemanWunsch.align` does,
+        but only for the aligned regions: the local alignment span is
+        `s1[opcodes[0][1]:opcodes[-1][2]]` and `s2[opcodes[0][3]:opcodes[-1][4]]`.
+        Returns an empty list if there is no alignment with a positive score.
+
+        The end of the alignment is found by the forward pass,
+        the start is found by the backward pass, and the region between
+        is globally aligned by Hirschberg's algorithm, so only O(m + n)
+        memory is needed.
+        """
+        s1, s2 = self._get_sequences(s1, s2)
+        gap_cost = self.gap_cost
+
+        # find the end of the best alignment
+        best, end_i, end_j = 0, 0, 0
+        prev = [0] * (len(s2) + 1)
+        for i, sims in enumerate(_sim_rows(self.sim_func, s1, s2), start=1):
+            cur = [0]
+            for j, sim_val in enumerate(sims, start=1):
+                cur.append(max(
+                    0,
+                    prev[j - 1] + sim_val,
+                    prev[j] - gap_cost,
+                    cur[j - 1] - gap_cost,
+                ))
+                if cur[j] > best:
+                    best, end_i, end_j = cur[j], i, j
+            prev = cur
+        if best <= 0:
+            return []
+
+        # find the start of the best alignment
+        aligner = NeedlemanWunsch(gap_cost=gap_cost, sim_func=self.sim_func)
+        rev1 = s1[:end_i][::-1]
+        rev2 = s2[:end_j][::-1]
+        best, length_i, length_j = float('-inf'), 0, 0
+        prev = [-(j * gap_cost) for j in range(len(rev2) + 1)]
+        for i, sims in enumerate(_sim_rows(self.sim_func, rev1, rev2), start=1):
+            cur = [-(i * gap_cost)]
+            for j, sim_val in enumerate(sims, start=1):
+                cur.append(max(
+                    prev[j - 1] + sim_val,
+                    prev[j] - gap_cost,
+                    cur[j - 1] - gap_cost,
+                ))
+                if cur[j] > best:
+                    best, length_i, length_j = cur[j], i, j
+            prev = cur
+
+        start_i = end_i - length_i
+        start_j = end_j - length_j
+        moves = aligner._hirschberg(s1[start_i:end_i], s2[start_j:end_j])
+        return aligner._to_opcodes(s1, s2, moves, i=start_i, j=start_j)
 
 
 class Gotoh(NeedlemanWunsch):
@@ -479,55 +663,155 @@ class Gotoh(NeedlemanWunsch):
     def maximum(self, *sequences):
         return min(map(len, sequences))
 
-    def __call__(self, s1, s2):
-        if not numpy:
-            raise ImportError('Please, install numpy for Gotoh measure')
+    def _score(self, s1, s2):
+        """Gotoh score in linear memory.
+
+        Only two rows of each of the three DP matrices are kept.
+        Rows are made over the shorter sequence, so memory is O(min(m, n)).
+        Transposition swaps the roles of the `p` and `q` matrices,
+        which doesn't change the score.
+        """
+        swap = len(s2) > len(s1)
+        if swap:
+            s1, s2 = s2, s1
+
+        inf = float('inf')
+        gap_open = self.gap_open
+        gap_ext = self.gap_ext
+        len_s2 = len(s2)
+
+        d_prev = [0] + [-inf] * len_s2
+        p_prev = [-inf] * (len_s2 + 1)
+        q_prev = [-inf] + [-gap_open - gap_ext * (j - 1) for j in range(1, len_s2 + 1)]
+        rows = _sim_rows(self.sim_func, s1, s2, swap=swap)
+        for i, sims in enumerate(rows, start=1):
+            d_cur = [-inf]
+            p_cur = [-gap_open - gap_ext * (i - 1)]
+            q_cur = [-inf]
+            for j, sim_val in enumerate(sims, start=1):
+                d_cur.append(max(
+                    d_prev[j - 1] + sim_val,
+                    p_prev[j - 1] + sim_val,
+                    q_prev[j - 1] + sim_val,
+                ))
+                p_cur.append(max(
+                    d_prev[j] - gap_open,
+                    p_prev[j] - gap_ext,
+                ))
+                q_cur.append(max(
+                    d_cur[j - 1] - gap_open,
+                    q_cur[j - 1] - gap_ext,
+                ))
+            d_prev, p_prev, q_prev = d_cur, p_cur, q_cur
+        return max(d_prev[-1], p_prev[-1], q_prev[-1])
 
+    def __call__(self, s1, s2):
         s1, s2 = self._get_sequences(s1, s2)
 
         # result = self.quick_answer(s1, s2)
         # if result is not None:
         #     return result * self.maximum(s1, s2)
 
-        len_s1 = len(s1)
+        return self._score(s1, s2)
+
+    def _last_rows(self, s1, s2, start=0):
+        """Get scores of aligning `s1` with every prefix of `s2`.
+
+        The alignment starts in the given state
+        (0 for match, 1 for gap in `s2`, 2 for gap in `s1`).
+        Returns the last rows of `d`, `p` and `q` matrices.
+        """
+        inf = float('inf')
+        gap_open = self.gap_open
+        gap_ext = self.gap_ext
+
+        rows = [[-inf] * (len(s2) + 1) for _ in range(3)]
+        rows[start][0] = 0
+        d_prev, p_prev, q_prev = rows
+        for j in range(1, len(s2) + 1):
+            q_prev[j] = max(d_prev[j - 1] - gap_open, q_prev[j - 1] - gap_ext)
+
+        for sims in _sim_rows(self.sim_func, s1, s2):
+            d_cur = [-inf]
+            p_cur = [max(d_prev[0] - gap_open, p_prev[0] - gap_ext)]
+            q_cur = [-inf]
+            for j, sim_val in enumerate(sims, start=1):
+                d_cur.append(max(d_prev[j - 1], p_prev[j - 1], q_prev[j - 1]) + sim_val)
+                p_cur.append(max(d_prev[j] - gap_open, p_prev[j] - gap_ext))
+                q_cur.append(max(d_cur[j - 1] - gap_open, q_cur[j - 1] - gap_ext))
+            d_prev, p_prev, q_prev = d_cur, p_cur, q_cur
+        return d_prev, p_prev, q_prev
+
+    def _first_rows(self, s1, s2, end=None):
+        """Get scores of aligning every suffix of `s2` with `s1`.
+
+        The alignment ends in the given state (any state if `end` is None).
+        Returns the first rows of backward `d`, `p` and `q` matrices:
+        the best score to reach the end from every cell of the first row,
+        given the state in the cell.
+        """
+        inf = float('inf')
+        gap_open = self.gap_open
+        gap_ext = self.gap_ext
         len_s2 = len(s2)
-        d_mat = numpy.zeros((len_s1 + 1, len_s2 + 1), dtype=numpy.float)
-        p_mat = numpy.zeros((len_s1 + 1, len_s2 + 1), dtype=numpy.float)
-        q_mat = numpy.zeros((len_s1 + 1, len_s2 + 1), dtype=numpy.float)
-
-        d_mat[0, 0] = 0
-        p_mat[0, 0] = float('-inf')
-        q_mat[0, 0] = float('-inf')
-        for i in range(1, len_s1 + 1):
-            d_mat[i, 0] = float('-inf')
-            p_mat[i, 0] = -self.gap_open - self.gap_ext * (i - 1)
-            q_mat[i, 0] = float('-inf')
-            q_mat[i, 1] = -self.gap_open
-        for j in range(1, len_s2 + 1):
-            d_mat[0, j] = float('-inf')
-            p_mat[0, j] = float('-inf')
-            p_mat[1, j] = -self.gap_open
-            q_mat[0, j] = -self.gap_open - self.gap_ext * (j - 1)
-
-        for i, sc1 in enumerate(s1, start=1):
-            for j, sc2 in enumerate(s2, start=1):
-                sim_val = self.sim_func(sc1, sc2)
-                d_mat[i, j] = max(
-                    d_mat[i - 1, j - 1] + sim_val,
-                    p_mat[i - 1, j - 1] + sim_val,
-                    q_mat[i - 1, j - 1] + sim_val,
-                )
-                p_mat[i, j] = max(
-                    d_mat[i - 1, j] - self.gap_open,
-                    p_mat[i - 1, j] - self.gap_ext,
-                )
-                q_mat[i, j] = max(
-                    d_mat[i, j - 1] - self.gap_open,
-                    q_mat[i, j - 1] - self.gap_ext,
-                )
 
-        i, j = (n - 1 for n in d_mat.shape)
-        return max(d_mat[i, j], p_mat[i, j], q_mat[i, j])
+        # similarities for rows from the last one
+        rows = _sim_rows(self.sim_func, s1[::-1], s2)
+        sims = None
+        d_next, p_next, q_next = [[-inf] * (len_s2 + 2) for _ in range(3)]
+        for i in range(len(s1), -1, -1):
+            if i < len(s1):
+                sims = next(rows)
+            d_cur, p_cur, q_cur = [[-inf] * (len_s2 + 2) for _ in range(3)]
+            if i == len(s1):
+                for state, row in enumerate((d_cur, p_cur, q_cur)):
+                    if end is None or end == state:
+                        row[len_s2] = 0
+            for j in range(len_s2 - 1 if i == len(s1) else len_s2, -1, -1):
+                match = -inf
+                if i < len(s1) and j < len_s2:
+                    match = sims[j] + d_next[j + 1]
+                d_cur[j] = max(match, p_next[j] - gap_open, q_cur[j + 1] - gap_open)
+                p_cur[j] = max(match, p_next[j] - gap_ext)
+                q_cur[j] = max(match, q_cur[j + 1] - gap_ext)
+            d_next, p_next, q_next = d_cur, p_cur, q_cur
+        return d_next[:-1], p_next[:-1], q_next[:-1]
+
+    def _hirschberg(self, s1, s2, start=0, end=None):
+        """Get moves of the optimal alignment with affine gaps in linear space.
+
+        Hirschberg's algorithm for three states, as Myers and Miller describe it:
+        the optimal path crosses the middle row of `s1` either with a match
+        or with a gap in `s2`, so the crossing and the states at both sides
+        are found from forward and backward passes.
+
+        https://doi.org/10.1093/bioinformatics/4.1.11
+        """
+        if not s1:
+            return [(0, 1)] * len(s2)
+
+        mid = len(s1) // 2
+        f_rows = self._last_rows(s1[:mid], s2, start=start)
+        b_rows = self._first_rows(s1[mid + 1:], s2, end=end)
+        gap_costs = (self.gap_open, self.gap_ext, float('inf'))
+
+        sims = next(_sim_rows(self.sim_func, s1[mid:mid + 1], s2))
+        best = None
+        for j in range(len(s2) + 1):
+            for state, row in enumerate(f_rows):
+                if j < len(s2):
+                    score = row[j] + sims[j] + b_rows[0][j + 1]
+                    if best is None or score > best[0]:
+                        best = score, j, state, (1, 1), 0
+                score = row[j] - gap_costs[state] + b_rows[1][j]
+                if best is None or score > best[0]:
+                    best = score, j, state, (1, 0), 1
+
+        _score, j, state, move, next_state = best
+        j2 = j + move[1]
+        left = self._hirschberg(s1[:mid], s2[:j], start=start, end=state)
+        right = self._hirschberg(s1[mid + 1:], s2[j2:], start=next_state, end=end)
+        return left + [move] + right
 
 
 class StrCmp95(_BaseSimilarity):
@@ -719,6 +1003,91 @@ class MLIPNS(_BaseSimilarity):
         return 0
 
 
+class QGramIndex:
+    """Inverted index of q-grams for edit distance search.
+
+    If the edit distance between strings is at most k then they share
+    at least `len(G) - k * q` of distinct q-grams G of every one of them,
+    because one edit operation breaks at most q q-grams (q + 1 for
+    a transposition in DamerauLevenshtein). Posting lists of q-grams are
+    merged to count shared q-grams, and only strings that pass this count
+    filter and the length filter are verified by the `algorithm`.
+
+    `strings` is a mapping of keys to strings or just an iterable of strings,
+    then keys are positions.
+    """
+    def __init__(self, strings=(), qval=2, algorithm=None):
+        self.qval = qval
+        self.algorithm = algorithm or Levenshtein()
+        self.keys = []
+        self.strings = []
+        self.sizes = array('I')  # count of distinct q-grams
+        self._postings = defaultdict(lambda: array('I'))
+        self._lengths = defaultdict(list)
+        if isinstance(strings, Mapping):
+            strings = strings.items()
+        else:
+            strings = enumerate(strings)
+        for key, string in strings:
+            self.add(key, string)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, string):
+        position = len(self.keys)
+        qgrams = set(find_ngrams(string, self.qval))
+        for qgram in qgrams:
+            self._postings[qgram].append(position)
+        self._lengths[len(string)].append(position)
+        self.keys.append(key)
+        self.strings.append(string)
+        self.sizes.append(len(qgrams))
+
+    def _count_shared(self, qgrams):
+        """Get positions of strings and counts of q-grams shared with `qgrams`.
+        """
+        postings = [self._postings[qgram] for qgram in qgrams if qgram in self._postings]
+        if not postings:
+            return []
+        if numpy:
+            merged = numpy.concatenate([numpy.frombuffer(p, dtype=numpy.uint32) for p in postings])
+            # only positions from the postings, not every string of the index
+            positions, counts = numpy.unique(merged, return_counts=True)
+            return zip(positions.tolist(), counts.tolist())
+        return Counter(chain.from_iterable(postings)).items()
+
+    def candidates(self, query, max_distance=1):
+        """Get positions of strings that pass the count and the length filters.
+        """
+        per_edit = self.qval + 1 if isinstance(self.algorithm, DamerauLevenshtein) else self.qval
+        qgrams = set(find_ngrams(query, self.qval))
+        threshold = len(qgrams) - max_distance * per_edit
+        lengths = range(len(query) - max_distance, len(query) + max_distance + 1)
+
+        # the count filter doesn't work, check all strings of suitable lengths
+        if threshold <= 0:
+            return sorted(chain.from_iterable(self._lengths.get(length, ()) for length in lengths))
+
+        result = []
+        for position, count in self._count_shared(qgrams):
+            if count < threshold or count < self.sizes[position] - max_distance * per_edit:
+                continue
+            if len(self.strings[position]) in lengths:
+                result.append(position)
+        return sorted(result)
+
+    def search(self, query, max_distance=1):
+        """Get `(key, distance)` pairs for strings within the distance from the query.
+        """
+        result = []
+        for position in self.candidates(query, max_distance):
+            distance = self.algorithm(query, self.strings[position])
+            if distance <= max_distance:
+                result.append((self.keys[position], distance))
+        return result
+
+
 hamming = Hamming()
 levenshtein = Levenshtein()
 damerau = damerau_levenshtein = DamerauLevenshtein()
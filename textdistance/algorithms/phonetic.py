@@ -1,5 +1,6 @@
 # built-in
 from collections import defaultdict
+from collections.abc import Mapping
 from itertools import groupby
 
 # app
@@ -10,14 +11,10 @@ try:
     from itertools import zip_longest
 except ImportError:
     from itertools import izip_longest as zip_longest
-try:
-    import numpy
-except ImportError:
-    numpy = None
 
 
 __all__ = [
-    'MRA', 'Editex',
+    'MRA', 'Editex', 'MRAIndex',
     'mra', 'editex',
 ]
 
@@ -46,7 +43,12 @@ class MRA(_BaseSimilarity):
     def __call__(self, *sequences):
         if not all(sequences):
             return 0
-        sequences = [list(self._calc_mra(s)) for s in sequences]
+        return self._compare(*[self._calc_mra(s) for s in sequences])
+
+    def _compare(self, *codexes):
+        """Get similarity of already calculated codexes.
+        """
+        sequences = [list(codex) for codex in codexes]
         lengths = list(map(len, sequences))
         count = len(lengths)
         max_length = max(lengths)
@@ -78,6 +80,11 @@ class Editex(_Base):
     http://citeseerx.ist.psu.edu/viewdoc/download?doi=10.1.1.18.2138&rep=rep1&type=pdf
     https://github.com/chrislit/blob/master/abydos/distance/_editex.py
     https://habr.com/ru/post/331174/ (RUS)
+
+    Costs for all pairs of letters from `groups` and `ungrouped` are calculated
+    once and shared between instances with the same settings. If `max_distance` is passed and the
+    distance is greater, `max_distance + 1` is returned. Then only cells of the matrix
+    that can be within `max_distance` are computed, and it stops as soon as a whole row is greater.
     """
     groups = (
         frozenset('AEIOUY'),
@@ -92,14 +99,16 @@ class Editex(_Base):
         frozenset('CSZ'),
     )
     ungrouped = frozenset('HW')  # all letters in alphabet that not presented in `grouped`
+    _tables = dict()
 
     def __init__(self, local=False, match_cost=0, group_cost=1, mismatch_cost=2,
-                 groups=None, ungrouped=None, external=True):
+                 groups=None, ungrouped=None, external=True, max_distance=None):
         self.match_cost = match_cost
         self.group_cost = group_cost
         self.mismatch_cost = mismatch_cost
         self.local = local
         self.external = external
+        self.max_distance = max_distance
 
         if groups is not None:
             if ungrouped is None:
@@ -113,7 +122,8 @@ class Editex(_Base):
             self.groups = self.letter_groups
 
     def maximum(self, *sequences):
-        return max(map(len, sequences)) * self.mismatch_cost
+        # letters are compared in upper case, and it can be longer ("ﬁ" is "FI")
+        return max(len(s.upper()) for s in sequences) * self.mismatch_cost
 
     def r_cost(self, *elements):
         if self._ident(*elements):
@@ -130,37 +140,182 @@ class Editex(_Base):
             return self.group_cost
         return self.r_cost(*elements)
 
+    def _cut(self, distance):
+        if self.max_distance is not None and distance > self.max_distance:
+            return self.max_distance + 1
+        return distance
+
+    def _get_tables(self):
+        """Get alphabet and dense tables of replacement and deletion costs.
+        """
+        key = (
+            type(self), tuple(map(frozenset, self.groups)), frozenset(self.ungrouped),
+            self.match_cost, self.group_cost, self.mismatch_cost,
+        )
+        tables = self._tables.get(key)
+        if tables is None:
+            # space is the padding before the first letter
+            alphabet = sorted(self.grouped | self.ungrouped | {' '})
+            tables = (
+                {char: index for index, char in enumerate(alphabet)},
+                [[self.r_cost(c1, c2) for c2 in alphabet] for c1 in alphabet],
+                [[self.d_cost(c1, c2) for c2 in alphabet] for c1 in alphabet],
+            )
+            self._tables[key] = tables
+        return tables
+
+    @staticmethod
+    def _get_cost(alphabet, table, func, c1, c2):
+        index1 = alphabet.get(c1)
+        index2 = alphabet.get(c2)
+        if index1 is None or index2 is None:
+            return func(c1, c2)
+        return table[index1][index2]
+
+    def _iter_costs(self, s1, s2, alphabet, r_costs, d_costs):
+        """Yield deletion cost and costs of replacement by all letters of s2 for every letter of s1.
+        """
+        r_rows = dict()
+        for cs1_prev, cs1_curr in zip(s1, s1[1:]):
+            d_cost = self._get_cost(alphabet, d_costs, self.d_cost, cs1_prev, cs1_curr)
+            r_row = r_rows.get(cs1_curr)
+            if r_row is None:
+                r_row = [self._get_cost(alphabet, r_costs, self.r_cost, cs1_curr, cs2) for cs2 in s2[1:]]
+                r_rows[cs1_curr] = r_row
+            yield d_cost, r_row
+
+    def _get_banded(self, first_row, ins_costs, rows):
+        """Get the distance computing only cells that can be within `max_distance`.
+
+        Cells greater than `max_distance` are stored as `max_distance + 1`.
+        Every row is computed from the first cell within the limit in the previous row
+        up to the last cell that still can be within the limit. The band isn't fixed
+        by `max_distance / cost`: deletion of a repeated letter costs `match_cost`,
+        which can be 0, and `local` makes the start of s1 free.
+        """
+        limit = self.max_distance + 1
+        prev_row = [min(cost, limit) for cost in first_row]
+        columns = len(prev_row)
+        first = 0
+        last = max(j for j, cost in enumerate(prev_row) if cost < limit)
+        for d_cost, r_row in rows:
+            cost = 0 if self.local else min(prev_row[0] + d_cost, limit)
+            row = [limit] * columns
+            row[0] = cost
+            new_first = new_last = 0 if cost < limit else None
+            start = 1 if cost < limit else max(first, 1)
+            cost = row[start - 1]
+            for j in range(start, columns):
+                # only insertions are left, and they can't decrease the cost
+                if j > last + 1 and cost >= limit:
+                    break
+                cost = min(prev_row[j] + d_cost, cost + ins_costs[j - 1], prev_row[j - 1] + r_row[j - 1], limit)
+                row[j] = cost
+                if cost < limit:
+                    if new_first is None:
+                        new_first = j
+                    new_last = j
+            if new_first is None:
+                return limit
+            first, last, prev_row = new_first, new_last, row
+        return prev_row[-1]
+
     def __call__(self, s1, s2):
         result = self.quick_answer(s1, s2)
         if result is not None:
-            return result
+            return self._cut(result)
 
         # must do `upper` before getting length because some one-char lowercase glyphs
         # are represented as two chars in uppercase.
         s1 = ' ' + s1.upper()
         s2 = ' ' + s2.upper()
-        len_s1 = len(s1) - 1
-        len_s2 = len(s2) - 1
-        if numpy:
-            d_mat = numpy.zeros((len_s1 + 1, len_s2 + 1), dtype=numpy.int)
+        alphabet, r_costs, d_costs = self._get_tables()
+        d_costs2 = [self._get_cost(alphabet, d_costs, self.d_cost, *chars) for chars in zip(s2, s2[1:])]
+        rows = self._iter_costs(s1, s2, alphabet, r_costs, d_costs)
+
+        prev_row = [0]
+        for cost in d_costs2:
+            prev_row.append(prev_row[-1] + cost)
+        if self.max_distance is not None:
+            return self._cut(self._get_banded(prev_row, d_costs2, rows))
+
+        for d_cost, r_row in rows:
+            cost = 0 if self.local else prev_row[0] + d_cost
+            row = [cost]
+            for diag, up, ins, sub in zip(prev_row, prev_row[1:], d_costs2, r_row):
+                cost = min(up + d_cost, cost + ins, diag + sub)
+                row.append(cost)
+            prev_row = row
+
+        return prev_row[-1]
+
+
+class MRAIndex:
+    """Blocking index of records by their MRA codex.
+
+    Codex of every record is calculated once. Records are grouped by length
+    of the codex. MRA similarity is 0 when lengths of codexes differ by more
+    than 2, so only buckets of compatible lengths are compared with the query.
+
+    `first_letter=True` also groups records by the first letter of the codex.
+    It's a lossy blocking heuristic: it makes buckets smaller, but drops true
+    MRA matches that start with different letters (like Catherine and Kathryn).
+    `records` is a mapping of keys to words or just an iterable of words,
+    then keys are positions.
+    """
+    def __init__(self, records=(), first_letter=False, mra=None):
+        self.mra = mra or MRA()
+        self.first_letter = first_letter
+        self.keys = []
+        self.codexes = []
+        self._buckets = defaultdict(list)
+        if isinstance(records, Mapping):
+            records = records.items()
         else:
-            d_mat = defaultdict(lambda: defaultdict(int))
-
-        if not self.local:
-            for i in range(1, len_s1 + 1):
-                d_mat[i][0] = d_mat[i - 1][0] + self.d_cost(s1[i - 1], s1[i])
-        for j in range(1, len_s2 + 1):
-            d_mat[0][j] = d_mat[0][j - 1] + self.d_cost(s2[j - 1], s2[j])
-
-        for i, (cs1_prev, cs1_curr) in enumerate(zip(s1, s1[1:]), start=1):
-            for j, (cs2_prev, cs2_curr) in enumerate(zip(s2, s2[1:]), start=1):
-                d_mat[i][j] = min(
-                    d_mat[i - 1][j] + self.d_cost(cs1_prev, cs1_curr),
-                    d_mat[i][j - 1] + self.d_cost(cs2_prev, cs2_curr),
-                    d_mat[i - 1][j - 1] + self.r_cost(cs1_curr, cs2_curr),
-                )
-
-        return d_mat[len_s1][len_s2]
+            records = enumerate(records)
+        for key, word in records:
+            self.add(key, word)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _get_bucket(self, codex, length):
+        if self.first_letter:
+            return length, codex[:1]
+        return length
+
+    def add(self, key, word):
+        codex = self.mra._calc_mra(word)
+        self._buckets[self._get_bucket(codex, len(codex))].append(len(self.keys))
+        self.keys.append(key)
+        self.codexes.append(codex)
+
+    def _get_positions(self, codex):
+        length = len(codex)
+        for other_length in range(max(0, length - 2), length + 3):
+            yield from self._buckets.get(self._get_bucket(codex, other_length), ())
+
+    def candidates(self, word):
+        """Get keys of records that can be similar to the word.
+        """
+        codex = self.mra._calc_mra(word)
+        return [self.keys[position] for position in self._get_positions(codex)]
+
+    def search(self, word, min_similarity=1):
+        """Get `(key, similarity)` pairs for records similar enough to the word.
+        """
+        if not word:
+            return []
+        codex = self.mra._calc_mra(word)
+        result = []
+        for position in self._get_positions(codex):
+            other = self.codexes[position]
+            if not other:
+                continue
+            similarity = self.mra._compare(codex, other)
+            if similarity >= min_similarity:
+                result.append((self.keys[position], similarity))
+        return result
 
 
 mra = MRA()
@@ -1,8 +1,9 @@
 # built-in
+from bisect import bisect_left, bisect_right
 from difflib import SequenceMatcher as _SequenceMatcher
+from itertools import combinations, product
 
 # app
-from ..utils import find_ngrams
 from .base import BaseSimilarity as _BaseSimilarity
 
 
@@ -19,15 +20,23 @@ __all__ = [
 ]
 
 
+class _StatesLimit(Exception):
+    """Memo of `LCSSeq` has got `max_states` points.
+    """
+
+
 class LCSSeq(_BaseSimilarity):
     """longest common subsequence similarity
 
     https://en.wikipedia.org/wiki/Longest_common_subsequence_problem
     """
-    def __init__(self, qval=1, test_func=None, external=True):
+    def __init__(self, qval=1, test_func=None, external=True, max_states=None):
         self.qval = qval
         self.test_func = test_func or self._ident
         self.external = external
+        # memory bound for more than 2 sequences, useful for 4 and more:
+        # when the memo gets so many points, the DP keeps only its frontier
+        self.max_states = max_states
 
     def _dynamic(self, seq1, seq2):
         """
@@ -49,7 +58,7 @@ class LCSSeq(_BaseSimilarity):
                     lengths[i + 1][j + 1] = max(lengths[i + 1][j], lengths[i][j + 1])
 
         # read the substring out from the matrix
-        result = ''
+        result = []
         i, j = len(seq1), len(seq2)
         while i != 0 and j != 0:
             if lengths[i][j] == lengths[i - 1][j]:
@@ -58,23 +67,363 @@ class LCSSeq(_BaseSimilarity):
                 j -= 1
             else:
                 assert seq1[i - 1] == seq2[j - 1]
-                result = seq1[i - 1] + result
+                result.append(seq1[i - 1])
                 i -= 1
                 j -= 1
+        return self._join(seq1, reversed(result))
+
+    @staticmethod
+    def _join(seq, elements):
+        """Make a sequence of the same type as `seq` from elements.
+        """
+        if isinstance(seq, str):
+            return ''.join(elements)
+        if isinstance(seq, bytes):
+            return bytes(elements)
+        return list(elements)
+
+    @staticmethod
+    def _bit_parallel(seq1, seq2):
+        """Get the length of the longest common subsequence.
+
+        Bit-vector algorithm by Allison-Dix and Hyyro: the DP row for `seq1`
+        is packed into an integer, so every element of `seq2` costs
+        a few bitwise operations over ceil(m / w) machine words.
+
+        https://doi.org/10.1016/0020-0190(86)90091-8
+        """
+        if len(seq1) < len(seq2):
+            seq1, seq2 = seq2, seq1
+        # bit masks of positions for every element of the longest sequence
+        masks = {}
+        for i, element in enumerate(seq1):
+            masks[element] = masks.get(element, 0) | (1 << i)
+
+        full = (1 << len(seq1)) - 1
+        row = full
+        for element in seq2:
+            matches = row & masks.get(element, 0)
+            row = ((row + matches) | (row - matches)) & full
+        return len(seq1) - bin(row).count('1')
+
+    @staticmethod
+    def _bit_rows(seq1, seq2):
+        """Get bit-vector DP rows for every prefix of `seq2`.
+
+        LCS length of seq1[:i] and seq2[:j] is
+        `i - popcount(rows[j] & (2 ** i - 1))`.
+        """
+        masks = {}
+        for i, element in enumerate(seq1):
+            masks[element] = masks.get(element, 0) | (1 << i)
+        full = (1 << len(seq1)) - 1
+        rows = [full]
+        for element in seq2:
+            row = rows[-1]
+            matches = row & masks.get(element, 0)
+            rows.append(((row + matches) | (row - matches)) & full)
+        return rows
+
+    def _upper_bound(self, sequences):
+        """Make a function to get upper bound of LCS length for prefixes.
+
+        The bound is the minimal LCS length for all pairs of sequences.
+        Returns None if the bound can't be used.
+        """
+        if self.test_func is not self._ident:
+            return None
+        try:
+            pairs = [
+                (a, b, self._bit_rows(sequences[a], sequences[b]))
+                for a, b in combinations(range(len(sequences)), 2)
+            ]
+        except TypeError:
+            # unhashable elements
+            return None
+
+        def bound(point):
+            return min(
+                point[a] - bin(rows[point[b]] & ((1 << point[a]) - 1)).count('1')
+                for a, b, rows in pairs
+            )
+        return bound
+
+    def _prefix_children(self, sequences):
+        """Make a function to get children of a point in the prefix DP.
+
+        Point is a tuple of prefix lengths. If the last elements of prefixes
+        are equal, the only child is all prefixes without them.
+        Otherwise, every child is one prefix without the last element.
+        Returns the result offset for children and the list of children.
+        """
+        def children(point):
+            if 0 in point:
+                return 0, []
+            if self.test_func(*[s[i - 1] for s, i in zip(sequences, point)]):
+                return 1, [tuple(i - 1 for i in point)]
+            return 0, [point[:t] + (i - 1, ) + point[t + 1:] for t, i in enumerate(point)]
+        return children
+
+    @staticmethod
+    def _match_children(sequences):
+        """Make a function to get children of a point in the match DP.
+
+        Point is a tuple of prefix lengths. Every child is a match point:
+        positions of the last occurrence of the same element in all prefixes.
+        Children dominated by another child (all positions are not greater)
+        are dropped because they can't have a longer subsequence.
+        """
+        positions = []
+        for s in sequences:
+            element_positions = {}
+            for i, element in enumerate(s):
+                element_positions.setdefault(element, []).append(i)
+            positions.append(element_positions)
+        alphabet = set(positions[0]).intersection(*positions[1:])
+
+        def children(point):
+            result = []
+            for element in alphabet:
+                child = []
+                for element_positions, i in zip(positions, point):
+                    element_positions = element_positions[element]
+                    index = bisect_left(element_positions, i) - 1
+                    if index < 0:
+                        break
+                    child.append(element_positions[index])
+                else:
+                    result.append(tuple(child))
+
+            # drop dominated children
+            result.sort(key=sum, reverse=True)
+            dominant = []
+            for child in result:
+                for other in dominant:
+                    if all(c <= o for c, o in zip(child, other)):
+                        break
+                else:
+                    dominant.append(child)
+            dominant.sort()
+            return 1, dominant
+        return children
+
+    def _longest(self, point, children_func, memo, bound=None):
+        """Get LCS length for prefixes of the given lengths.
+
+        The value of every point is the best of its children values
+        plus the offset. Values are memoized, and the DP is implemented
+        with an explicit stack to avoid recursion limit. Children
+        are explored from the most promising one until the upper bound
+        of the rest is not enough to improve the result.
+        """
+        result = None
+        # frame is point, children to explore, result offset, best result
+        stack = [[point, None, 0, 0]]
+        while stack:
+            frame = stack[-1]
+            point, children, offset, best = frame
+            if children is None:
+                if point in memo:
+                    result = memo[point]
+                    stack.pop()
+                    continue
+                offset, children = children_func(point)
+                if bound is not None:
+                    children = sorted(children, key=bound)
+                frame[1] = children
+                frame[2] = offset
+            elif result is not None:
+                best = max(best, result + offset)
+                result = None
+
+            pushed = False
+            while children:
+                child = children.pop()
+                if bound is not None and bound(child) + offset <= best:
+                    # children are sorted by bound
+                    children.clear()
+                    break
+                if child in memo:
+                    best = max(best, memo[child] + offset)
+                    continue
+                stack.append([child, None, 0, 0])
+                pushed = True
+                break
+            frame[3] = best
+            if pushed:
+                continue
+
+            stack.pop()
+            if self.max_states and len(memo) >= self.max_states:
+                raise _StatesLimit
+            memo[point] = result = best
         return result
 
-    def _recursive(self, *sequences):
-        if not all(sequences):
-            return type(sequences[0])()  # empty sequence
-        if self.test_func(*[s[-1] for s in sequences]):
-            c = sequences[0][-1]
-            sequences = [s[:-1] for s in sequences]
-            return self(*sequences) + c
-        m = type(sequences[0])()  # empty sequence
-        for i, s in enumerate(sequences):
-            ss = sequences[:i] + (s[:-1], ) + sequences[i + 1:]
-            m = max([self(*ss), m], key=len)
-        return m
+    @staticmethod
+    def _by_levels(sequences, read_out=False):
+        """Get LCS length and, if `read_out`, its elements, level by level.
+
+        Level `l` holds dominant match points where common subsequences
+        of length `l` can end. Points of the next level are the next
+        occurrences of every element after points of the current one.
+        Only the current level is kept in memory, and links to previous
+        levels are kept only to read the subsequence out.
+        """
+        positions = []
+        for s in sequences:
+            element_positions = {}
+            for i, element in enumerate(s):
+                element_positions.setdefault(element, []).append(i)
+            positions.append(element_positions)
+        alphabet = set(positions[0]).intersection(*positions[1:])
+
+        level = {(-1, ) * len(sequences): None}
+        links = []
+        length = 0
+        while True:
+            # next match point for every element, linked to its parent
+            candidates = dict()
+            for point in level:
+                for element in alphabet:
+                    child = []
+                    for element_positions, i in zip(positions, point):
+                        element_positions = element_positions[element]
+                        index = bisect_right(element_positions, i)
+                        if index == len(element_positions):
+                            break
+                        child.append(element_positions[index])
+                    else:
+                        candidates.setdefault(tuple(child), point)
+            if not candidates:
+                break
+
+            # drop dominated points, they can't be followed by more elements
+            dominant = dict()
+            for child in sorted(candidates, key=sum):
+                for other in dominant:
+                    if all(o <= c for o, c in zip(other, child)):
+                        break
+                else:
+                    dominant[child] = candidates[child]
+            if read_out:
+                links.append(dominant)
+            level = dominant
+            length += 1
+
+        if not read_out:
+            return length, None
+        result = []
+        point = next(iter(level))
+        for dominant in reversed(links):
+            result.append(sequences[0][point[0]])
+            point = dominant[point]
+        return length, result[::-1]
+
+    def _by_planes(self, sequences, read_out=False):
+        """Get LCS length and, if `read_out`, its elements, plane by plane.
+
+        DP over all prefixes for custom `test_func`: the plane of the DP
+        for every prefix of the first sequence is calculated from the previous
+        one, so only one plane is kept in memory. All planes are kept
+        only to read the subsequence out.
+        """
+        first, *others = sequences
+        sizes = [len(s) + 1 for s in others]
+        strides = [1] * len(sizes)
+        for t in range(len(sizes) - 2, -1, -1):
+            strides[t] = strides[t + 1] * sizes[t + 1]
+        diagonal = sum(strides)
+        points = [
+            (sum(i * stride for i, stride in zip(point, strides)), point)
+            for point in product(*map(range, sizes))
+            if 0 not in point
+        ]
+
+        plane = [0] * (strides[0] * sizes[0])
+        planes = [plane]
+        for element in first:
+            prev, plane = plane, [0] * len(plane)
+            for index, point in points:
+                if self.test_func(element, *[s[i - 1] for s, i in zip(others, point)]):
+                    plane[index] = prev[index - diagonal] + 1
+                else:
+                    plane[index] = max(prev[index], *[plane[index - stride] for stride in strides])
+            if read_out:
+                planes.append(plane)
+        length = plane[-1]
+        if not read_out:
+            return length, None
+
+        result = []
+        i, index = len(first), len(plane) - 1
+        while len(result) < length:
+            plane = planes[i]
+            if planes[i - 1][index] == plane[index]:
+                i -= 1
+                continue
+            for stride in strides:
+                if plane[index - stride] == plane[index]:
+                    index -= stride
+                    break
+            else:
+                result.append(first[i - 1])
+                i -= 1
+                index -= diagonal
+        return length, result[::-1]
+
+    def _bounded(self, sequences, read_out=False):
+        """Find LCS for more than `max_states` points in memo.
+        """
+        if self.test_func is self._ident:
+            try:
+                return self._by_levels(sequences, read_out)
+            except TypeError:
+                # unhashable elements
+                pass
+        return self._by_planes(sequences, read_out)
+
+    def _engine(self, sequences):
+        """Get children function and upper bound for sequences.
+
+        Match points DP is used for hashable elements,
+        and DP over all prefixes is used for custom `test_func`.
+        """
+        if self.test_func is self._ident:
+            try:
+                return self._match_children(sequences), self._upper_bound(sequences)
+            except TypeError:
+                # unhashable elements
+                pass
+        return self._prefix_children(sequences), None
+
+    def _memoized(self, *sequences):
+        """Get the longest common subsequence of many sequences.
+
+        Memoized DP over positions in sequences, without slicing.
+        If the memo gets `max_states` points, the subsequence
+        is found level by level (or plane by plane) instead.
+        """
+        memo = dict()
+        children_func, bound = self._engine(sequences)
+        point = tuple(map(len, sequences))
+        try:
+            length = self._longest(point, children_func, memo, bound)
+
+            # read the subsequence out from the memo
+            result = []
+            while len(result) < length:
+                expected = length - len(result)
+                offset, children = children_func(point)
+                for child in reversed(children):
+                    if self._longest(child, children_func, memo, bound) + offset == expected:
+                        break
+                if offset:
+                    result.append(sequences[0][child[0]])
+                point = child
+            result.reverse()
+        except _StatesLimit:
+            _length, result = self._bounded(sequences, read_out=True)
+        return self._join(sequences[0], result)
 
     def __call__(self, *sequences):
         if not sequences:
@@ -83,10 +432,23 @@ class LCSSeq(_BaseSimilarity):
         if len(sequences) == 2:
             return self._dynamic(*sequences)
         else:
-            return self._recursive(*sequences)
+            return self._memoized(*sequences)
 
     def similarity(self, *sequences):
-        return len(self(*sequences))
+        if len(sequences) < 2:
+            return len(self(*sequences))
+        sequences = self._get_sequences(*sequences)
+        if len(sequences) == 2:
+            try:
+                return self._bit_parallel(*sequences)
+            except TypeError:
+                # unhashable elements
+                return len(self._dynamic(*sequences))
+        children_func, bound = self._engine(sequences)
+        try:
+            return self._longest(tuple(map(len, sequences)), children_func, dict(), bound)
+        except _StatesLimit:
+            return self._bounded(sequences)[0]
 
 
 class LCSStr(_BaseSimilarity):
@@ -97,18 +459,118 @@ class LCSStr(_BaseSimilarity):
         match = matcher.find_longest_match(0, len(s1), 0, len(s2))
         return s1[match.a: match.a + match.size]
 
-    def _custom(self, *sequences):
-        short = min(sequences, key=len)
-        length = len(short)
-        for n in range(length, 0, -1):
-            for subseq in find_ngrams(short, n):
-                subseq = ''.join(subseq)
-                for seq in sequences:
-                    if subseq not in seq:
-                        break
+    @classmethod
+    def _find_longest(cls, *sequences):
+        """Find the longest common substring with a suffix automaton.
+
+        The automaton is built for the first of the shortest sequences,
+        and every other sequence is walked through it to get the longest
+        match for every state. It takes linear time for all sequences.
+        Returns the length of the substring and its first start in every
+        sequence. The leftmost substring in the shortest sequence is chosen.
+
+        https://cp-algorithms.com/string/suffix-automaton.html
+        """
+        short_index = min(range(len(sequences)), key=lambda i: len(sequences[i]))
+        short = sequences[short_index]
+
+        # build the automaton
+        links = [-1]
+        lengths = [0]
+        transitions = [{}]
+        ends = [-1]  # the first end position in the short sequence
+        last = 0
+        for i, element in enumerate(short):
+            cur = len(lengths)
+            links.append(-1)
+            lengths.append(lengths[last] + 1)
+            transitions.append({})
+            ends.append(i)
+            state = last
+            while state != -1 and element not in transitions[state]:
+                transitions[state][element] = cur
+                state = links[state]
+            if state == -1:
+                links[cur] = 0
+            else:
+                other = transitions[state][element]
+                if lengths[state] + 1 == lengths[other]:
+                    links[cur] = other
                 else:
-                    return subseq
-        return type(short)()  # empty sequence
+                    clone = len(lengths)
+                    links.append(links[other])
+                    lengths.append(lengths[state] + 1)
+                    transitions.append(dict(transitions[other]))
+                    ends.append(ends[other])
+                    while state != -1 and transitions[state].get(element) == other:
+                        transitions[state][element] = clone
+                        state = links[state]
+                    links[other] = links[cur] = clone
+            last = cur
+
+        # states from the longest to the shortest, to propagate matches to links
+        order = sorted(range(1, len(lengths)), key=lengths.__getitem__, reverse=True)
+        common = list(lengths)
+        for index, seq in enumerate(sequences):
+            if index == short_index:
+                continue
+            matches = [0] * len(lengths)
+            for state, length in cls._walk(seq, links, lengths, transitions):
+                if length > matches[state]:
+                    matches[state] = length
+            for state in order:
+                link = links[state]
+                if matches[state] and lengths[link] > matches[link]:
+                    matches[link] = lengths[link]
+            for state in range(len(lengths)):
+                common[state] = min(common[state], matches[state])
+
+        size = max(common)
+        if not size:
+            return 0, [0] * len(sequences)
+        state = min(
+            (state for state, length in enumerate(common) if length == size),
+            key=ends.__getitem__,
+        )
+        # the state of the found substring and states that have it as a suffix
+        while lengths[links[state]] >= size:
+            state = links[state]
+        suffixed = [False] * len(lengths)
+        suffixed[state] = True
+        for other in reversed(order):
+            suffixed[other] = suffixed[other] or suffixed[links[other]]
+
+        starts = []
+        for index, seq in enumerate(sequences):
+            if index == short_index:
+                starts.append(ends[state] - size + 1)
+                continue
+            for i, (other, length) in enumerate(cls._walk(seq, links, lengths, transitions)):
+                if length >= size and suffixed[other]:
+                    starts.append(i - size + 1)
+                    break
+        return size, starts
+
+    @staticmethod
+    def _walk(seq, links, lengths, transitions):
+        """Yield the state and the length of the longest match for every element.
+        """
+        state = length = 0
+        for element in seq:
+            while state and element not in transitions[state]:
+                state = links[state]
+                length = lengths[state]
+            if element in transitions[state]:
+                state = transitions[state][element]
+                length += 1
+            else:
+                state = length = 0
+            yield state, length
+
+    def _automaton(self, *sequences):
+        size, starts = self._find_longest(*sequences)
+        index = min(range(len(sequences)), key=lambda i: len(sequences[i]))
+        return sequences[index][starts[index]:starts[index] + size]
 
     def __call__(self, *sequences):
         if not all(sequences):
@@ -122,7 +584,7 @@ class LCSStr(_BaseSimilarity):
         sequences = self._get_sequences(*sequences)
         if length == 2 and max(map(len, sequences)) < 200:
             return self._standart(*sequences)
-        return self._custom(*sequences)
+        return self._automaton(*sequences)
 
     def similarity(self, *sequences):
         return len(self(*sequences))
@@ -148,14 +610,54 @@ class RatcliffObershelp(_BaseSimilarity):
     def maximum(self, *sequences):
         return 1
 
+    @staticmethod
+    def _matched(matcher, seq1, seq2):
+        """Sum sizes of the matching blocks found by the longest matches.
+
+        The ranges left of and right of every match are processed
+        with an explicit stack, and the matcher keeps the index
+        of its second sequence between calls. Ranges of 200 elements
+        and longer are matched like `LCSStr` does it for them, with a new
+        suffix automaton for slices of every such range, so results
+        are the same as for `LCSStr` on subsequences.
+        """
+        total = 0
+        stack = [(0, len(seq1), 0, len(seq2))]
+        while stack:
+            lo1, hi1, lo2, hi2 = stack.pop()
+            if max(hi1 - lo1, hi2 - lo2) < 200:
+                i, j, size = matcher.find_longest_match(lo1, hi1, lo2, hi2)
+            else:
+                size, (i, j) = LCSStr._find_longest(seq1[lo1:hi1], seq2[lo2:hi2])
+                i, j = i + lo1, j + lo2
+            if not size:
+                continue
+            total += size
+            if lo1 < i and lo2 < j:
+                stack.append((lo1, i, lo2, j))
+            if i + size < hi1 and j + size < hi2:
+                stack.append((i + size, hi1, j + size, hi2))
+        return total
+
     def _find(self, *sequences):
-        subseq = LCSStr()(*sequences)
-        length = len(subseq)
-        if length == 0:
-            return 0
-        before = [s[:s.find(subseq)] for s in sequences]
-        after = [s[s.find(subseq) + length:] for s in sequences]
-        return self._find(*before) + length + self._find(*after)
+        if len(sequences) == 2:
+            matcher = _SequenceMatcher(None, *sequences, autojunk=False)
+            return self._matched(matcher, *sequences)
+
+        total = 0
+        stack = [[(0, len(s)) for s in sequences]]
+        while stack:
+            ranges = stack.pop()
+            if not all(lo < hi for lo, hi in ranges):
+                continue
+            size, starts = LCSStr._find_longest(*[s[lo:hi] for s, (lo, hi) in zip(sequences, ranges)])
+            if not size:
+                continue
+            total += size
+            starts = [lo + start for (lo, _hi), start in zip(ranges, starts)]
+            stack.append([(lo, start) for (lo, _hi), start in zip(ranges, starts)])
+            stack.append([(start + size, hi) for (_lo, hi), start in zip(ranges, starts)])
+        return total
 
     def __call__(self, *sequences):
         result = self.quick_answer(*sequences)
@@ -166,6 +668,28 @@ class RatcliffObershelp(_BaseSimilarity):
         sequences = self._get_sequences(*sequences)
         return scount * self._find(*sequences) / ecount
 
+    def many(self, query, candidates):
+        """Compare every candidate with the query.
+
+        The index of the query is built once and reused for all candidates,
+        but only for ranges shorter than 200 elements. Longer ranges are
+        matched like `LCSStr` does it: a suffix automaton is built for
+        the slices of every such range.
+        Returns the list of values that `self(candidate, query)` returns.
+        """
+        query_seq = self._get_sequences(query)[0]
+        matcher = _SequenceMatcher(None, b=query_seq, autojunk=False)
+        result = []
+        for candidate in candidates:
+            answer = self.quick_answer(candidate, query)
+            if answer is None:
+                candidate_seq = self._get_sequences(candidate)[0]
+                matcher.set_seq1(candidate_seq)
+                matched = self._matched(matcher, candidate_seq, query_seq)
+                answer = 2 * matched / (len(query) + len(candidate))
+            result.append(answer)
+        return result
+
 
 lcsseq = LCSSeq()
 lcsstr = LCSStr()
@@ -5,8 +5,14 @@ from itertools import takewhile
 from .base import Base as _Base, BaseSimilarity as _BaseSimilarity
 
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
 __all__ = [
-    'Prefix', 'Postfix', 'Length', 'Identity', 'Matrix',
+    'Prefix', 'Postfix', 'Length', 'Identity', 'Matrix', 'CompiledMatrix',
     'prefix', 'postfix', 'length', 'identity', 'matrix',
 ]
 
@@ -94,7 +100,7 @@ class Matrix(_BaseSimilarity):
             return self.mat[sequences]
         # search in symmetric matrix
         if self.symmetric:
-            sequences = tuple(reversed(sequences))
+            sequences = sequences[::-1]
             if sequences in self.mat:
                 return self.mat[sequences]
         # if identity then return match_cost
@@ -103,6 +109,57 @@ class Matrix(_BaseSimilarity):
         # not found
         return self.mismatch_cost
 
+    def compile(self, alphabet=None):
+        """Compile the matrix into a dense table over the given alphabet.
+
+        If alphabet isn't specified, all elements from the matrix are used.
+        """
+        if alphabet is None:
+            alphabet = sorted({element for pair in self.mat or () for element in pair})
+        return CompiledMatrix(self, alphabet)
+
+
+class CompiledMatrix(Matrix):
+    """Matrix similarity compiled into a dense numpy table
+
+    Alignment algorithms (NeedlemanWunsch, SmithWaterman, Gotoh)
+    gather whole rows of similarities from the table instead of calling
+    the matrix for every pair of elements.
+    Elements outside of the alphabet fall back to the matrix lookup.
+    """
+
+    def __init__(self, matrix, alphabet):
+        if not numpy:
+            raise ImportError('Please, install numpy for matrix compiling')
+        self.mat = matrix.mat
+        self.mismatch_cost = matrix.mismatch_cost
+        self.match_cost = matrix.match_cost
+        self.symmetric = matrix.symmetric
+
+        # unique elements, order preserved
+        self.alphabet = tuple(dict.fromkeys(alphabet))
+        self.index = {element: i for i, element in enumerate(self.alphabet)}
+        self.table = numpy.array([
+            [matrix(e1, e2) for e2 in self.alphabet]
+            for e1 in self.alphabet
+        ])
+
+    def encode(self, sequence):
+        """Convert sequence into numpy array of indices in the table.
+
+        Raises KeyError if any element is not in the alphabet.
+        """
+        index = self.index
+        return numpy.fromiter((index[e] for e in sequence), dtype=numpy.intp, count=len(sequence))
+
+    def __call__(self, *sequences):
+        if len(sequences) == 2:
+            try:
+                return self.table[self.index[sequences[0]], self.index[sequences[1]]].item()
+            except (KeyError, TypeError):
+                pass
+        return super().__call__(*sequences)
+
 
 prefix = Prefix()
 postfix = Postfix()
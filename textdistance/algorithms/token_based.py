@@ -1,16 +1,25 @@
 # built-in
+from collections import Counter
+from collections.abc import Mapping
 from functools import reduce
 from itertools import islice, permutations, repeat
 from math import log
 
 # app
-from .base import Base as _Base, BaseSimilarity as _BaseSimilarity
+from .base import Base as _Base, BaseSimilarity as _BaseSimilarity, TokenProfile, Vocabulary
 from .edit_based import DamerauLevenshtein
 
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
 __all__ = [
     'Jaccard', 'Sorensen', 'Tversky',
     'Overlap', 'Cosine', 'Tanimoto', 'MongeElkan', 'Bag',
+    'TokenProfile', 'Vocabulary', 'TokenMatrix', 'TokenStatistics',
 
     'jaccard', 'sorensen', 'tversky', 'sorensen_dice',
     'overlap', 'cosine', 'tanimoto', 'monge_elkan', 'bag',
@@ -36,15 +45,15 @@ class Jaccard(_BaseSimilarity):
         return 1
 
     def __call__(self, *sequences):
-        result = self.quick_answer(*sequences)
+        return self.from_statistics(TokenStatistics(*sequences, qval=self.qval))
+
+    def from_statistics(self, statistics):
+        result = self.quick_answer(*statistics.sequences)
         if result is not None:
             return result
 
-        sequences = self._get_counters(*sequences)               # sets
-        intersection = self._intersect_counters(*sequences)      # set
-        intersection = self._count_counters(intersection)        # int
-        union = self._union_counters(*sequences)                 # set
-        union = self._count_counters(union)                      # int
+        intersection = statistics.intersection(self.as_set)      # int
+        union = statistics.union(self.as_set)                    # int
         return intersection / union
 
 
@@ -67,14 +76,15 @@ class Sorensen(_BaseSimilarity):
         return 1
 
     def __call__(self, *sequences):
-        result = self.quick_answer(*sequences)
+        return self.from_statistics(TokenStatistics(*sequences, qval=self.qval))
+
+    def from_statistics(self, statistics):
+        result = self.quick_answer(*statistics.sequences)
         if result is not None:
             return result
 
-        sequences = self._get_counters(*sequences)               # sets
-        count = sum(self._count_counters(s) for s in sequences)
-        intersection = self._intersect_counters(*sequences)      # set
-        intersection = self._count_counters(intersection)        # int
+        count = sum(statistics.sizes(self.as_set))
+        intersection = statistics.intersection(self.as_set)      # int
         return 2.0 * intersection / count
 
 
@@ -95,14 +105,15 @@ class Tversky(_BaseSimilarity):
         return 1
 
     def __call__(self, *sequences):
-        result = self.quick_answer(*sequences)
+        return self.from_statistics(TokenStatistics(*sequences, qval=self.qval))
+
+    def from_statistics(self, statistics):
+        result = self.quick_answer(*statistics.sequences)
         if result is not None:
             return result
 
-        sequences = self._get_counters(*sequences)                # sets
-        intersection = self._intersect_counters(*sequences)       # set
-        intersection = self._count_counters(intersection)         # int
-        sequences = [self._count_counters(s) for s in sequences]  # ints
+        intersection = statistics.intersection(self.as_set)       # int
+        sequences = statistics.sizes(self.as_set)                 # ints
         ks = list(islice(self.ks, len(sequences)))
 
         if len(sequences) == 2 or self.bias is None:
@@ -135,14 +146,15 @@ class Overlap(_BaseSimilarity):
         return 1
 
     def __call__(self, *sequences):
-        result = self.quick_answer(*sequences)
+        return self.from_statistics(TokenStatistics(*sequences, qval=self.qval))
+
+    def from_statistics(self, statistics):
+        result = self.quick_answer(*statistics.sequences)
         if result is not None:
             return result
 
-        sequences = self._get_counters(*sequences)                  # sets
-        intersection = self._intersect_counters(*sequences)         # set
-        intersection = self._count_counters(intersection)           # int
-        sequences = [self._count_counters(s) for s in sequences]    # ints
+        intersection = statistics.intersection(self.as_set)         # int
+        sequences = statistics.sizes(self.as_set)                   # ints
 
         return intersection / min(sequences)
 
@@ -162,14 +174,15 @@ class Cosine(_BaseSimilarity):
         return 1
 
     def __call__(self, *sequences):
-        result = self.quick_answer(*sequences)
+        return self.from_statistics(TokenStatistics(*sequences, qval=self.qval))
+
+    def from_statistics(self, statistics):
+        result = self.quick_answer(*statistics.sequences)
         if result is not None:
             return result
 
-        sequences = self._get_counters(*sequences)                  # sets
-        intersection = self._intersect_counters(*sequences)         # set
-        intersection = self._count_counters(intersection)           # int
-        sequences = [self._count_counters(s) for s in sequences]    # ints
+        intersection = statistics.intersection(self.as_set)         # int
+        sequences = statistics.sizes(self.as_set)                   # ints
         prod = reduce(lambda x, y: x * y, sequences)
 
         return intersection / pow(prod, 1.0 / len(sequences))
@@ -180,8 +193,8 @@ class Tanimoto(Jaccard):
     This is identical to the Jaccard similarity coefficient
     and the Tversky index for alpha=1 and beta=1.
     """
-    def __call__(self, *sequences):
-        result = super().__call__(*sequences)
+    def from_statistics(self, statistics):
+        result = super().from_statistics(statistics)
         if result == 0:
             return float('-inf')
         else:
@@ -190,17 +203,29 @@ class Tanimoto(Jaccard):
 
 class MongeElkan(_BaseSimilarity):
     """
+    Similarity of every pair of tokens is calculated only once per call.
+    Pass `symmetric_inner=True` if the inner algorithm is symmetric to reuse
+    similarity of the reversed pair, then `symmetric=True` calculates every
+    pair only once. Pass a dict (or another mutable mapping) as `cache`
+    to keep similarities of tokens between calls, keys include the inner algorithm.
+    Pass `inner_maximum` (like 1 for normalized algorithms) to stop looking
+    for the most similar token when the similarity reaches it.
+
     https://www.academia.edu/200314/Generalized_Monge-Elkan_Method_for_Approximate_Text_String_Comparison
     http://www.cs.cmu.edu/~wcohen/postscript/kdd-2003-match-ws.pdf
     https://github.com/Yomguithereal/talisman/blob/master/src/metrics/distance/monge-elkan.js
     """
     _damerau_levenshtein = DamerauLevenshtein()
 
-    def __init__(self, algorithm=_damerau_levenshtein, symmetric=False, qval=1, external=True):
+    def __init__(self, algorithm=_damerau_levenshtein, symmetric=False, qval=1, external=True,
+                 cache=None, inner_maximum=None, symmetric_inner=False):
         self.algorithm = algorithm
         self.symmetric = symmetric
+        self.symmetric_inner = symmetric_inner
         self.qval = qval
         self.external = external
+        self.cache = cache
+        self.inner_maximum = inner_maximum
 
     def maximum(self, *sequences):
         result = self.algorithm.maximum(sequences)
@@ -209,43 +234,266 @@ class MongeElkan(_BaseSimilarity):
                 result = max(result, self.algorithm.maximum(*seq))
         return result
 
-    def _calc(self, seq, *sequences):
+    def _get_similarity(self, c1, c2, similarities):
+        key = (self.algorithm, c1, c2)
+        if key in similarities:
+            return similarities[key]
+        if self.symmetric_inner and (self.algorithm, c2, c1) in similarities:
+            return similarities[self.algorithm, c2, c1]
+        similarity = self.algorithm.similarity(c1, c2)
+        similarities[key] = similarity
+        return similarity
+
+    def _get_max(self, c1, tokens, similarities):
+        max_sim = float('-inf')
+        for c2 in tokens:
+            max_sim = max(max_sim, self._get_similarity(c1, c2, similarities))
+            if self.inner_maximum is not None and max_sim >= self.inner_maximum:
+                break
+        return max_sim
+
+    def _calc(self, seq, *sequences, similarities=None):
         if not seq:
             return 0
+        if similarities is None:
+            similarities = self._get_similarities()
+        # repeated tokens have the same max similarity
+        sequences = [list(dict.fromkeys(s)) for s in sequences]
+        row_maxes = dict()
         maxes = []
         for c1 in seq:
-            for s in sequences:
-                max_sim = float('-inf')
-                for c2 in s:
-                    max_sim = max(max_sim, self.algorithm.similarity(c1, c2))
-                maxes.append(max_sim)
+            for index, s in enumerate(sequences):
+                if (c1, index) not in row_maxes:
+                    row_maxes[c1, index] = self._get_max(c1, s, similarities)
+                maxes.append(row_maxes[c1, index])
         return sum(maxes) / len(seq) / len(maxes)
 
+    def _get_similarities(self):
+        if self.cache is None:
+            return dict()
+        return self.cache
+
     def __call__(self, *sequences):
+        if any(hasattr(s, 'dtype') for s in sequences):
+            raise TypeError('MongeElkan compares tokens with the inner algorithm, hashed n-grams are not supported')
         result = self.quick_answer(*sequences)
         if result is not None:
             return result
         sequences = self._get_sequences(*sequences)
 
+        similarities = self._get_similarities()
         if self.symmetric:
             result = []
             for seqs in permutations(sequences):
-                result.append(self._calc(*seqs))
+                result.append(self._calc(*seqs, similarities=similarities))
             return sum(result) / len(result)
         else:
-            return self._calc(*sequences)
+            return self._calc(*sequences, similarities=similarities)
 
 
 class Bag(_Base):
     """Bag distance
     https://github.com/Yomguithereal/talisman/blob/master/src/metrics/distance/bag.js
     """
+    def maximum(self, *sequences):
+        # length of Counter or TokenProfile is count of distinct tokens
+        return max(
+            sum(s.values()) if isinstance(s, (Counter, TokenProfile)) else len(s)
+            for s in sequences
+        )
+
     def __call__(self, *sequences):
-        sequences = self._get_counters(*sequences)              # sets
-        intersection = self._intersect_counters(*sequences)     # set
-        sequences = (self._count_counters(sequence - intersection) for sequence in sequences)
-        # ^ ints
-        return max(sequences)
+        return self.from_statistics(TokenStatistics(*sequences, qval=self.qval))
+
+    def from_statistics(self, statistics):
+        # every sequence contains the intersection
+        intersection = statistics.intersection()                # int
+        return max(statistics.sizes()) - intersection
+
+
+class TokenStatistics:
+    """Token counts of sequences that token based algorithms are made of.
+
+    Counters of the sequences, their intersection and union are computed
+    only once and only if some algorithm needs them. Sizes are counted
+    for bags or for sets (`as_set=True`) of tokens. Use it to get results
+    of many token based algorithms for the same sequences, for example,
+    `TokenStatistics('test', 'text')(Jaccard(), Cosine(as_set=True))`.
+    """
+    def __init__(self, *sequences, qval=1):
+        self.sequences = sequences
+        self.qval = qval
+        self._cache = dict()
+
+    def __call__(self, *algorithms):
+        """Get results of algorithms, every one of them should have the same `qval`.
+        """
+        for algorithm in algorithms:
+            if getattr(algorithm, 'qval', 1) != self.qval:
+                raise ValueError('qval of {!r} differs from the statistics one'.format(algorithm))
+        return [algorithm.from_statistics(self) for algorithm in algorithms]
+
+    def _get(self, key, func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    @staticmethod
+    def _count(counter, as_set):
+        if as_set:
+            return len(counter)
+        return sum(counter.values())
+
+    @property
+    def counters(self):
+        return self._get('counters', lambda: _Base(qval=self.qval)._get_counters(*self.sequences))
+
+    def sizes(self, as_set=False):
+        """Get counts of tokens of every sequence.
+        """
+        return self._get(('sizes', as_set), lambda: [self._count(c, as_set) for c in self.counters])
+
+    def intersection(self, as_set=False):
+        """Get count of tokens that all sequences contain.
+        """
+        counter = self._get('intersection', lambda: _Base()._intersect_counters(*self.counters))
+        return self._get(('intersection', as_set), lambda: self._count(counter, as_set))
+
+    def union(self, as_set=False):
+        """Get count of tokens that any sequence contains.
+        """
+        counter = self._get('union', lambda: _Base()._union_counters(*self.counters))
+        return self._get(('union', as_set), lambda: self._count(counter, as_set))
+
+
+class TokenMatrix:
+    """Document-token matrix of the corpus for batched Cosine, Jaccard and Overlap.
+
+    Documents are split into tokens like `Cosine(qval=qval, as_set=as_set)`
+    does it and stored as a CSR matrix of NumPy arrays. When `as_set=False`,
+    every repeat of the token is a separate column (`n`-th occurrence
+    of the token), so the size of intersection of bags is the dot product
+    of binary rows, and results are the same as for token based algorithms.
+
+    `corpus` is a mapping of keys to documents or just a sequence of documents,
+    then keys are positions in the sequence. Similarity of documents without
+    tokens is 0, even for the same documents. NumPy is required.
+    """
+    metrics = ('cosine', 'jaccard', 'overlap')
+
+    def __init__(self, corpus, qval=1, as_set=False):
+        if not numpy:
+            raise ImportError('Please, install the numpy module')
+        self.qval = qval
+        self.as_set = as_set
+        self.vocabulary = Vocabulary(qval=qval)
+        if isinstance(corpus, Mapping):
+            self.keys = list(corpus.keys())
+            corpus = corpus.values()
+        else:
+            corpus = list(corpus)
+            self.keys = list(range(len(corpus)))
+
+        rows = [self._encode(document, add=True)[0] for document in corpus]
+        self.indptr = numpy.zeros(len(rows) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(row) for row in rows], out=self.indptr[1:])
+        self.indices = numpy.concatenate(rows) if rows else numpy.zeros(0, dtype=numpy.int64)
+        self.sizes = numpy.diff(self.indptr)
+
+        # transposed (CSC) matrix: rows of documents for every token
+        columns = len(self.vocabulary)
+        order = numpy.argsort(self.indices, kind='stable')
+        self._postings = numpy.repeat(numpy.arange(len(rows)), self.sizes)[order]
+        self._postings_ptr = numpy.zeros(columns + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(self.indices, minlength=columns), out=self._postings_ptr[1:])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _encode(self, sequence, add=False):
+        """Return sorted array of columns of the sequence and its size.
+
+        Unknown tokens of queries aren't added, but they are counted in the size.
+        """
+        counter = Counter(self.vocabulary.tokenize(sequence))
+        if self.as_set:
+            tokens = list(counter)
+        else:
+            tokens = [(token, n) for token, count in counter.items() for n in range(count)]
+        ids = self.vocabulary.ids
+        if add:
+            columns = [ids.setdefault(token, len(ids)) for token in tokens]
+        else:
+            columns = [ids[token] for token in tokens if token in ids]
+        return numpy.sort(numpy.array(columns, dtype=numpy.int64)), len(tokens)
+
+    def _get_intersections(self, columns, rows_count=1, rows=None):
+        """Return matrix of intersection sizes of rows and all documents.
+
+        `rows` is the number of row in the chunk for every column.
+        """
+        starts = self._postings_ptr[columns]
+        lengths = self._postings_ptr[columns + 1] - starts
+        # positions of all postings of the columns, concatenated
+        offsets = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths)
+        documents = self._postings[offsets + numpy.arange(lengths.sum())]
+        if rows is not None:
+            documents = documents + numpy.repeat(rows, lengths) * len(self)
+        counts = numpy.bincount(documents, minlength=rows_count * len(self))
+        return counts.reshape(rows_count, len(self))
+
+    def _get_scores(self, intersections, sizes, metric):
+        sizes = numpy.asarray(sizes).reshape(-1, 1)
+        if metric == 'cosine':
+            denominators = numpy.sqrt(sizes * self.sizes)
+        elif metric == 'jaccard':
+            denominators = sizes + self.sizes - intersections
+        elif metric == 'overlap':
+            denominators = numpy.minimum(sizes, self.sizes)
+        else:
+            raise ValueError('Unknown metric: {}. Choose one of: {}'.format(metric, ', '.join(self.metrics)))
+        scores = numpy.zeros(intersections.shape)
+        numpy.divide(intersections, denominators, out=scores, where=denominators != 0)
+        return scores
+
+    def similarities(self, query, metric='cosine'):
+        """Get similarity of the query and every document, in order of the corpus.
+        """
+        columns, size = self._encode(query)
+        intersections = self._get_intersections(columns)
+        return self._get_scores(intersections, [size], metric)[0]
+
+    def _get_top(self, scores, k, min_score, exclude=None):
+        if exclude is not None:
+            scores[exclude] = 0
+        positions = numpy.flatnonzero((scores > 0) & (scores >= min_score))
+        if len(positions) > k:
+            positions = numpy.sort(positions[numpy.argpartition(-scores[positions], k - 1)[:k]])
+        positions = positions[numpy.argsort(-scores[positions], kind='stable')]
+        return [(self.keys[position], float(scores[position])) for position in positions.tolist()]
+
+    def nearest(self, query, k=1, metric='cosine', min_score=0):
+        """Get `k` most similar documents as a list of `(key, similarity)` pairs.
+
+        Documents without common tokens with the query are never returned.
+        """
+        return self._get_top(self.similarities(query, metric), k, min_score)
+
+    def top_k(self, k=1, metric='cosine', min_score=0, chunk_size=64):
+        """Compare every document with all others, yield `(key, nearest)` pairs.
+
+        `nearest` is the same as `nearest(document)` returns, except the document
+        itself. Documents are compared in chunks of `chunk_size` rows, every chunk
+        takes `chunk_size * len(self)` integers of memory.
+        """
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            columns = self.indices[self.indptr[start]:self.indptr[stop]]
+            rows = numpy.repeat(numpy.arange(stop - start), self.sizes[start:stop])
+            intersections = self._get_intersections(columns, stop - start, rows)
+            scores = self._get_scores(intersections, self.sizes[start:stop], metric)
+            for row, position in enumerate(range(start, stop)):
+                yield self.keys[position], self._get_top(scores[row], k, min_score, exclude=position)
 
 
 bag = Bag()
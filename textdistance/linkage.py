@@ -0,0 +1,279 @@
+# built-in
+from collections import defaultdict
+from collections.abc import Mapping
+from itertools import chain
+
+# app
+from .algorithms.phonetic import MRA
+from .utils import find_ngrams
+
+
+__all__ = [
+    'Blocker', 'KeyBlocker', 'ExactBlocker', 'LengthBlocker', 'PhoneticBlocker',
+    'QGramBlocker', 'SortedNeighbourhoodBlocker', 'Linker',
+]
+
+
+def _iter_records(records):
+    """Records are a mapping of ids to records or an iterable of `(id, record)` pairs.
+    """
+    if isinstance(records, Mapping):
+        return iter(records.items())
+    return iter(records)
+
+
+def _get_getter(field):
+    if callable(field):
+        return field
+    return lambda record: record[field]
+
+
+class Blocker:
+    """Base class for candidate pairs generators.
+
+    `pairs` yields pairs of `(id, record)` items of both record streams
+    that should be compared. Blockers can be combined: `blocker1 | blocker2`
+    yields pairs from any of them and `blocker1 & blocker2` only pairs
+    that both of them yield.
+
+    Streaming blockers index the second stream once with `index` and then
+    get candidates for every record of the first stream with `candidates`,
+    so the first stream is consumed lazily and never stored.
+    """
+    streaming = True
+
+    def index(self, records_b):
+        raise NotImplementedError
+
+    def candidates(self, index, record_a):
+        """Yield `(id, record)` items of the second stream for the record.
+        """
+        raise NotImplementedError
+
+    def pairs(self, records_a, records_b):
+        index = self.index(records_b)
+        for item_a in _iter_records(records_a):
+            for item_b in self.candidates(index, item_a[1]):
+                yield item_a, item_b
+
+    def __or__(self, other):
+        return _UnionBlocker(self, other)
+
+    def __and__(self, other):
+        return _IntersectionBlocker(self, other)
+
+
+class _CombinedBlocker(Blocker):
+    """Combination of blockers.
+
+    When all blockers are streaming, the second stream is indexed by every
+    blocker and the first one is streamed. Otherwise both streams are stored
+    in lists and every blocker gets them, in memory of both streams
+    and, for the intersection, all pairs of all blockers but the first one.
+    """
+    def __init__(self, *blockers):
+        self.blockers = blockers
+        self.streaming = all(blocker.streaming for blocker in blockers)
+
+    def index(self, records_b):
+        records_b = list(_iter_records(records_b))
+        return [blocker.index(records_b) for blocker in self.blockers]
+
+    def pairs(self, records_a, records_b):
+        if self.streaming:
+            return super().pairs(records_a, records_b)
+        return self._stored_pairs(list(_iter_records(records_a)), list(_iter_records(records_b)))
+
+
+class _UnionBlocker(_CombinedBlocker):
+    def candidates(self, index, record_a):
+        seen = set()
+        for blocker, blocker_index in zip(self.blockers, index):
+            for item_b in blocker.candidates(blocker_index, record_a):
+                if item_b[0] not in seen:
+                    seen.add(item_b[0])
+                    yield item_b
+
+    def _stored_pairs(self, records_a, records_b):
+        seen = set()
+        for blocker in self.blockers:
+            for item_a, item_b in blocker.pairs(records_a, records_b):
+                ids = (item_a[0], item_b[0])
+                if ids not in seen:
+                    seen.add(ids)
+                    yield item_a, item_b
+
+
+class _IntersectionBlocker(_CombinedBlocker):
+    def candidates(self, index, record_a):
+        (first, *others), (first_index, *other_indices) = self.blockers, index
+        allowed = [
+            {item_b[0] for item_b in blocker.candidates(blocker_index, record_a)}
+            for blocker, blocker_index in zip(others, other_indices)
+        ]
+        for item_b in first.candidates(first_index, record_a):
+            if all(item_b[0] in ids for ids in allowed):
+                yield item_b
+
+    def _stored_pairs(self, records_a, records_b):
+        first, *others = self.blockers
+        allowed = None
+        for blocker in others:
+            ids = {(item_a[0], item_b[0]) for item_a, item_b in blocker.pairs(records_a, records_b)}
+            allowed = ids if allowed is None else allowed & ids
+        for item_a, item_b in first.pairs(records_a, records_b):
+            if (item_a[0], item_b[0]) in allowed:
+                yield item_a, item_b
+
+
+class KeyBlocker(Blocker):
+    """Pairs records that share at least one blocking key.
+
+    `keys` is a function that gets a record and returns its keys.
+    The second stream is indexed by keys, the first one is streamed lazily.
+    """
+    def __init__(self, keys):
+        self.keys = keys
+
+    def _get_index_keys(self, record):
+        return self.keys(record)
+
+    def index(self, records_b):
+        index = defaultdict(list)
+        for item_b in _iter_records(records_b):
+            for key in set(self._get_index_keys(item_b[1])):
+                index[key].append(item_b)
+        return index
+
+    def candidates(self, index, record_a):
+        seen = set()
+        for key in self.keys(record_a):
+            for item_b in index.get(key, ()):
+                if item_b[0] not in seen:
+                    seen.add(item_b[0])
+                    yield item_b
+
+
+class ExactBlocker(KeyBlocker):
+    """Pairs records with the same value of the field.
+
+    `field` is a key of the record or a function that gets the value.
+    """
+    def __init__(self, field):
+        self.field = field
+        getter = _get_getter(field)
+        super().__init__(lambda record: [getter(record)])
+
+
+class LengthBlocker(KeyBlocker):
+    """Pairs records where lengths of the field differ by at most `tolerance`.
+    """
+    def __init__(self, field, tolerance=0):
+        self.field = field
+        self.tolerance = tolerance
+        getter = _get_getter(field)
+        self._length = lambda record: len(getter(record))
+        super().__init__(
+            lambda record: range(self._length(record) - tolerance, self._length(record) + tolerance + 1),
+        )
+
+    def _get_index_keys(self, record):
+        return [self._length(record)]
+
+
+class PhoneticBlocker(KeyBlocker):
+    """Pairs records with the same phonetic code of the field.
+
+    `encoder` gets a word and returns its code, MRA codex by default.
+    """
+    def __init__(self, field, encoder=None):
+        self.field = field
+        self.encoder = encoder or MRA()._calc_mra
+        getter = _get_getter(field)
+        super().__init__(lambda record: [self.encoder(getter(record))])
+
+
+class QGramBlocker(Blocker):
+    """Pairs records that share at least `min_common` q-grams of the field.
+    """
+    def __init__(self, field, qval=3, min_common=1):
+        self.field = field
+        self.qval = qval
+        self.min_common = min_common
+        self._getter = _get_getter(field)
+
+    def _get_qgrams(self, record):
+        return set(find_ngrams(self._getter(record), self.qval))
+
+    def index(self, records_b):
+        records_b = list(_iter_records(records_b))
+        index = defaultdict(list)
+        for position, item_b in enumerate(records_b):
+            for qgram in self._get_qgrams(item_b[1]):
+                index[qgram].append(position)
+        return records_b, index
+
+    def candidates(self, index, record_a):
+        records_b, index = index
+        counts = defaultdict(int)
+        for qgram in self._get_qgrams(record_a):
+            for position in index.get(qgram, ()):
+                counts[position] += 1
+        for position in sorted(counts):
+            if counts[position] >= self.min_common:
+                yield records_b[position]
+
+
+class SortedNeighbourhoodBlocker(Blocker):
+    """Pairs records that are close when both streams are sorted by a key.
+
+    Records of both streams are sorted together by the `field` value
+    (or the result of the function), and every record is paired with
+    records of the other stream among the next `window - 1` records.
+    Both streams are sorted in memory, so it isn't a streaming blocker.
+    """
+    streaming = False
+
+    def __init__(self, field, window=3):
+        self.field = field
+        self.window = window
+        self._getter = _get_getter(field)
+
+    def pairs(self, records_a, records_b):
+        merged = sorted(
+            chain(
+                ((self._getter(item[1]), 0, item) for item in _iter_records(records_a)),
+                ((self._getter(item[1]), 1, item) for item in _iter_records(records_b)),
+            ),
+            key=lambda entry: entry[:2],
+        )
+        for position, (_key, side, item) in enumerate(merged):
+            for _other_key, other_side, other in merged[position + 1:position + self.window]:
+                if side == other_side:
+                    continue
+                if side == 0:
+                    yield item, other
+                else:
+                    yield other, item
+
+
+class Linker:
+    """Compare candidate pairs of records field by field.
+
+    `comparators` is a mapping of fields to algorithms. Every candidate pair
+    from the blocker is yielded lazily as `(id_a, id_b, scores)`, where scores
+    is a dict of fields to results of the `method` of the algorithm.
+    """
+    def __init__(self, blocker, comparators, method='normalized_similarity'):
+        self.blocker = blocker
+        self.comparators = comparators
+        self.method = method
+
+    def link(self, records_a, records_b):
+        methods = {
+            field: getattr(algorithm, self.method)
+            for field, algorithm in self.comparators.items()
+        }
+        for (id_a, record_a), (id_b, record_b) in self.blocker.pairs(records_a, records_b):
+            scores = {field: method(record_a[field], record_b[field]) for field, method in methods.items()}
+            yield id_a, id_b, scores
@@ -1,19 +1,44 @@
 # built-in
-from itertools import permutations, product
+from collections import deque
+from itertools import islice, permutations, product
 
 
-__all__ = ['words_combinations', 'find_ngrams']
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
-def words_combinations(f, *texts):
-    m = float('Inf')
+__all__ = ['words_combinations', 'find_ngrams', 'iter_ngrams', 'hash_ngrams']
+
+
+def words_combinations(f, *texts, mode='permutations'):
+    """Return minimal result of `f` for texts with words in any order.
+
+    mode='permutations': try all permutations of words of every text.
+        It's exact, but takes `(n!) ** k` calls of `f` for `k` texts of `n` words.
+    mode='assignment': reorder words of every text to match words of the first
+        text, minimizing the sum of `f` for matched words (Hungarian algorithm).
+        Words without a match go to the end. It's `n * n` calls of `f` for words
+        and one call for the texts.
+    mode='sorted': sort words of every text.
+    mode='set': compare sorted common words of all texts followed by sorted
+        other words of every text, and common words alone with each text.
+    """
+    if mode not in _COMBINATIONS:
+        raise ValueError('Unknown mode: {}. Choose one of: {}'.format(mode, ', '.join(_COMBINATIONS)))
     # split by words
     texts = [t.split() for t in texts]
+    return _COMBINATIONS[mode](f, texts)
+
+
+def _permutations_combinations(f, texts):
+    m = float('Inf')
     # permutations
     texts = [permutations(words) for words in texts]
     # combinations
     for subtexts in product(*texts):
-        if f.equality:
+        if getattr(f, 'equality', False):
             words_min_cnt = len(min(subtexts, key=len))
             subtexts = [t[:words_min_cnt] for t in subtexts]
         subtexts = [' '.join(t) for t in subtexts]
@@ -21,5 +46,144 @@ def words_combinations(f, *texts):
     return m
 
 
+def _assignment_combinations(f, texts):
+    first, *others = texts
+    subtexts = [first]
+    for words in others:
+        if not first or not words:
+            subtexts.append(words)
+            continue
+        if len(first) <= len(words):
+            columns = _solve_assignment([[f(w1, w2) for w2 in words] for w1 in first])
+        else:
+            rows = _solve_assignment([[f(w1, w2) for w1 in first] for w2 in words])
+            # words are ordered as their matches in the first text
+            columns = sorted(range(len(words)), key=rows.__getitem__)
+        matched = set(columns)
+        columns += [column for column in range(len(words)) if column not in matched]
+        subtexts.append([words[column] for column in columns])
+    return f(*[' '.join(t) for t in subtexts])
+
+
+def _sorted_combinations(f, texts):
+    return f(*[' '.join(sorted(words)) for words in texts])
+
+
+def _set_combinations(f, texts):
+    words_sets = [set(words) for words in texts]
+    common = sorted(set.intersection(*words_sets))
+    subtexts = [' '.join(common + sorted(words - set(common))) for words in words_sets]
+    if not common:
+        return f(*subtexts)
+    common = ' '.join(common)
+    return min([f(*subtexts)] + [f(common, subtext) for subtext in subtexts])
+
+
+_COMBINATIONS = {
+    'permutations': _permutations_combinations,
+    'assignment': _assignment_combinations,
+    'sorted': _sorted_combinations,
+    'set': _set_combinations,
+}
+
+
+def _solve_assignment(costs):
+    """Return the column for every row of the cost matrix with minimal sum of costs.
+
+    It's the Hungarian algorithm with potentials, O(n * n * m) for n rows and m >= n columns.
+    """
+    rows, columns = len(costs), len(costs[0])
+    inf = float('Inf')
+    # potentials of rows and columns, row of every column, previous column in the path
+    u = [0] * (rows + 1)
+    v = [0] * (columns + 1)
+    matches = [0] * (columns + 1)
+    way = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        matches[0] = row
+        column0 = 0
+        min_values = [inf] * (columns + 1)
+        used = [False] * (columns + 1)
+        while matches[column0]:
+            used[column0] = True
+            row0 = matches[column0]
+            delta = inf
+            column1 = 0
+            for column in range(1, columns + 1):
+                if used[column]:
+                    continue
+                value = costs[row0 - 1][column - 1] - u[row0] - v[column]
+                if value < min_values[column]:
+                    min_values[column] = value
+                    way[column] = column0
+                if min_values[column] < delta:
+                    delta = min_values[column]
+                    column1 = column
+            for column in range(columns + 1):
+                if used[column]:
+                    u[matches[column]] += delta
+                    v[column] -= delta
+                else:
+                    min_values[column] -= delta
+            column0 = column1
+        # augment the path
+        while column0:
+            column1 = way[column0]
+            matches[column0] = matches[column1]
+            column0 = column1
+
+    result = [0] * rows
+    for column in range(1, columns + 1):
+        if matches[column]:
+            result[matches[column] - 1] = column - 1
+    return result
+
+
 def find_ngrams(input_list, n):
+    """Return list of n-grams as tuples.
+    """
     return list(zip(*[input_list[i:] for i in range(n)]))
+
+
+def iter_ngrams(input_list, n):
+    """Lazily yield n-grams.
+
+    Unlike `find_ngrams`, n-grams of str and bytes are substrings, which are
+    cheaper to hash and compare. N-grams of other iterables are tuples.
+    """
+    if isinstance(input_list, (str, bytes)):
+        return (input_list[i:i + n] for i in range(len(input_list) - n + 1))
+    return _iter_tuples(input_list, n)
+
+
+def _iter_tuples(input_list, n):
+    iterator = iter(input_list)
+    window = deque(islice(iterator, n - 1), maxlen=n)
+    for element in iterator:
+        window.append(element)
+        yield tuple(window)
+
+
+def hash_ngrams(data, n, base=0x100000001b3):
+    """Return numpy array of uint64 polynomial hashes of all n-grams of str or bytes.
+
+    Hash of the n-gram is the sum of codes of its elements multiplied by powers of
+    `base` modulo 2 ** 64. Different n-grams can get the same hash, but it's unlikely.
+    The array can be passed into token based algorithms instead of the text,
+    except `MongeElkan`: it compares tokens themselves with the inner algorithm.
+    """
+    if not numpy:
+        raise ImportError('Please, install the numpy module')
+    if isinstance(data, str):
+        codes = numpy.frombuffer(data.encode('utf-32-le'), dtype=numpy.uint32)
+    else:
+        codes = numpy.frombuffer(data, dtype=numpy.uint8)
+    count = len(codes) - n + 1
+    if count <= 0:
+        return numpy.zeros(0, dtype=numpy.uint64)
+    codes = codes.astype(numpy.uint64)
+    result = numpy.zeros(count, dtype=numpy.uint64)
+    for offset in range(n):
+        result *= numpy.uint64(base)
+        result += codes[offset:offset + count]
+    return result